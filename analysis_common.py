@@ -0,0 +1,41 @@
+"""Shared loading and summary helpers for the analyze_*.py scripts."""
+
+import ijson
+import orjson
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Union
+
+RESULTS_FILE = Path('results/results.json')
+
+@dataclass
+class Summary:
+    """Outcome counts gathered in one pass over the results"""
+    total: int = 0
+    succeeded: int = 0  # records whose success flag is set
+    perfect: int = 0  # records with final_score == 1
+    passed: List[Dict[str, Any]] = field(default_factory=list)  # final_score >= pass_score
+
+def load_results(path: Union[str, Path] = RESULTS_FILE) -> List[Dict[str, Any]]:
+    """Load the whole results array in one read."""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def iter_results(path: Union[str, Path] = RESULTS_FILE) -> Iterator[Dict[str, Any]]:
+    """Stream result records one at a time instead of loading the whole file."""
+    with open(path, 'rb') as f:
+        yield from ijson.items(f, 'item', use_float=True)
+
+def summarize(results: Iterable[Dict[str, Any]], pass_score: float = 0.8) -> Summary:
+    """Count outcomes under each success criterion used by the scripts."""
+    summary = Summary()
+    for result in results:
+        summary.total += 1
+        if result.get('success', False):
+            summary.succeeded += 1
+        score = result.get('final_score', 0)
+        if score == 1:
+            summary.perfect += 1
+        if score >= pass_score:
+            summary.passed.append(result)
+    return summary
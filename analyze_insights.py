@@ -1,95 +1,111 @@
-import json
-from collections import defaultdict
-from typing import Dict, List, Any
-
-def load_results() -> List[Dict[str, Any]]:
-    with open('results/results.json') as f:
-        return json.load(f)
-
-def analyze_results(results: List[Dict[str, Any]]) -> None:
-    total_tasks = len(results)
-    successes = [r for r in results if r.get('success', False)]
-    failures = [r for r in results if not r.get('success', False)]
-    
+import heapq
+from collections import Counter, defaultdict, deque
+from typing import Dict, Iterable, Any
+
+from analysis_common import iter_results
+
+# Number of error types shown in the error analysis section
+TOP_K = 20
+
+# (substring, label) pairs used to group similar error messages; first match wins
+ERROR_RULES = (
+    ('has no attribute', "Missing attribute error"),
+    ('timeout', "Timeout error"),
+    ('not found', "Element not found"),
+    ('failed evaluation', "Failed evaluation checks"),
+)
+
+def categorize_error(error: str) -> str:
+    error_lc = error.lower()
+    return next((label for needle, label in ERROR_RULES if needle in error_lc), error)
+
+def categorize_task(task_desc: str) -> str:
+    desc = task_desc.lower()
+    if 'click' in desc:
+        return 'Click'
+    elif 'type' in desc or 'enter' in desc:
+        return 'Type/Input'
+    elif 'search' in desc:
+        return 'Search'
+    elif 'hover' in desc:
+        return 'Hover'
+    return 'Other'
+
+def extract_website(task_id: str) -> str:
+    return task_id.partition('_')[0] if '_' in task_id else 'unknown'
+
+def analyze_results(results: Iterable[Dict[str, Any]]) -> None:
+    # Single pass over the records, keeping only counters and a few examples
+    total_tasks = 0
+    success_count = 0
+    fail_count = 0
+    successes = deque(maxlen=3)
+    failures = deque(maxlen=3)
+    error_types = defaultdict(int)
+    # Keyed by (category, 'success'|'fail') so each update is one lookup
+    task_types = Counter()
+    website_stats = Counter()
+
+    for task in results:
+        total_tasks += 1
+        ok = task.get('success', False)
+        if ok:
+            success_count += 1
+            if len(successes) < 3:
+                successes.append(task)
+        else:
+            fail_count += 1
+            if len(failures) < 3:
+                failures.append(task)
+
+            error = task.get('error', 'Unknown error')
+            if isinstance(error, str):
+                error = categorize_error(error)
+            error_types[error] += 1
+
+        key = 'success' if ok else 'fail'
+        task_types[categorize_task(task.get('task_description', '')), key] += 1
+        website_stats[extract_website(task.get('task_id', 'unknown')), key] += 1
+
     print("\n=== Overall Statistics ===")
     print(f"Total Tasks: {total_tasks}")
-    print(f"Success Rate: {len(successes)/total_tasks*100:.2f}% ({len(successes)} successes, {len(failures)} failures)")
+    print(f"Success Rate: {success_count/total_tasks*100:.2f}% ({success_count} successes, {fail_count} failures)")
 
     # Error Analysis
-    error_types = defaultdict(int)
-    for task in failures:
-        error = task.get('error', 'Unknown error')
-        if isinstance(error, str):
-            # Simplify error messages to group similar errors
-            if 'has no attribute' in error:
-                error = "Missing attribute error"
-            elif 'timeout' in error.lower():
-                error = "Timeout error"
-            elif 'not found' in error.lower():
-                error = "Element not found"
-            elif 'failed evaluation' in error.lower():
-                error = "Failed evaluation checks"
-        error_types[error] += 1
-
     print("\n=== Error Analysis ===")
     print("Common failure reasons:")
-    for error, count in sorted(error_types.items(), key=lambda x: x[1], reverse=True):
-        percentage = (count / len(failures)) * 100
+    for error, count in heapq.nlargest(TOP_K, error_types.items(), key=lambda x: x[1]):
+        percentage = (count / fail_count) * 100
         print(f"{error}: {percentage:.1f}% ({count} tasks)")
 
     # Task Type Analysis
-    def categorize_task(task_desc: str) -> str:
-        desc = task_desc.lower()
-        if 'click' in desc:
-            return 'Click'
-        elif 'type' in desc or 'enter' in desc:
-            return 'Type/Input'
-        elif 'search' in desc:
-            return 'Search'
-        elif 'hover' in desc:
-            return 'Hover'
-        return 'Other'
-
-    task_types = defaultdict(lambda: {'success': 0, 'fail': 0})
-    for task in results:
-        task_type = categorize_task(task.get('task_description', ''))
-        if task.get('success', False):
-            task_types[task_type]['success'] += 1
-        else:
-            task_types[task_type]['fail'] += 1
-
     print("\n=== Task Type Analysis ===")
-    for task_type, stats in task_types.items():
-        total = stats['success'] + stats['fail']
-        success_rate = (stats['success']/total*100) if total > 0 else 0
-        print(f"{task_type}: {success_rate:.1f}% success rate ({stats['success']}/{total} tasks)")
+    for task_type in dict.fromkeys(category for category, _ in task_types):
+        succeeded = task_types[task_type, 'success']
+        total = succeeded + task_types[task_type, 'fail']
+        success_rate = (succeeded/total*100) if total > 0 else 0
+        print(f"{task_type}: {success_rate:.1f}% success rate ({succeeded}/{total} tasks)")
 
     # Website Analysis
-    def extract_website(task_id: str) -> str:
-        return task_id.split('_')[0] if '_' in task_id else 'unknown'
-
-    website_stats = defaultdict(lambda: {'success': 0, 'fail': 0})
-    for task in results:
-        website = extract_website(task.get('task_id', 'unknown'))
-        if task.get('success', False):
-            website_stats[website]['success'] += 1
-        else:
-            website_stats[website]['fail'] += 1
-
     print("\n=== Website Performance ===")
-    for website, stats in sorted(website_stats.items(), 
-                               key=lambda x: (x[1]['success'] + x[1]['fail']), 
-                               reverse=True):
-        total = stats['success'] + stats['fail']
-        if total < 2:  # Skip websites with very few tasks
-            continue
-        success_rate = (stats['success']/total*100)
-        print(f"{website}: {success_rate:.1f}% success rate ({stats['success']}/{total} tasks)")
+    website_totals = (
+        (website, website_stats[website, 'success'], website_stats[website, 'success'] + website_stats[website, 'fail'])
+        for website in dict.fromkeys(category for category, _ in website_stats)
+    )
+    # Skip websites with very few tasks before ranking the rest
+    ranked_websites = sorted(
+        (entry for entry in website_totals if entry[2] >= 2),
+        key=lambda x: x[2],
+        reverse=True
+    )
+    for website, succeeded, total in ranked_websites:
+        success_rate = (succeeded/total*100)
+        print(f"{website}: {success_rate:.1f}% success rate ({succeeded}/{total} tasks)")
 
     # Example Analysis
     print("\n=== Example Cases ===")
     print("\nSuccessful Tasks:")
-    for task in successes[:3]:
+    for task in successes:
         print(f"✓ {task.get('task_description', '')}")
         print(f"  ID: {task.get('task_id', '')}")
         if task.get('error'):
@@ -97,7 +113,7 @@ def analyze_results(results: List[Dict[str, Any]]) -> None:
         print()
 
     print("\nFailed Tasks:")
-    for task in failures[:3]:
+    for task in failures:
         print(f"✗ {task.get('task_description', '')}")
         print(f"  ID: {task.get('task_id', '')}")
         if task.get('error'):
@@ -105,5 +121,5 @@ def analyze_results(results: List[Dict[str, Any]]) -> None:
         print()
 
 if __name__ == "__main__":
-    results = load_results()
+    results = iter_results()
     analyze_results(results)
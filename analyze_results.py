@@ -1,14 +1,11 @@
-import json
-from pathlib import Path
+from analysis_common import iter_results, summarize
 
-# Read results file
-results_file = Path('results/results.json')
-with open(results_file) as f:
-    results = json.load(f)
+# Stream the results file, keeping only the successful records
+summary = summarize(iter_results(), pass_score=.8)
+total_tasks = summary.total
+successful_tasks = summary.passed
 
 # Calculate success percentage
-total_tasks = len(results)
-successful_tasks = [result for result in results if result.get('final_score', 0) >= .8]
 success_percentage = (len(successful_tasks) / total_tasks) * 100 if total_tasks > 0 else 0
 
 print(f"\nResults Analysis:")
@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 
 import os
-import json
 import logging
+import orjson
 import argparse
 from pathlib import Path
 from typing import Dict, Any, List
 
-from evaluation.auto_eval import run_evaluation
+from evaluation.auto_eval import run_evaluation, run_batch_evaluation
+from evaluation.image_match import register_image_urls
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,21 +20,29 @@ def load_results(results_file: Path) -> List[Dict[str, Any]]:
     if not results_file.exists():
         raise FileNotFoundError(f"Results file not found: {results_file}")
     
-    with open(results_file, 'r') as f:
-        return json.load(f)
+    with open(results_file, 'rb') as f:
+        return orjson.loads(f.read())
 
 def save_results(results: List[Dict[str, Any]], output_file: Path):
     """Save results to a JSON file."""
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
 
 def main():
     parser = argparse.ArgumentParser(description='Evaluate DOM benchmark results')
     parser.add_argument('--tasks', required=True, help='Path to tasks JSONL file')
     parser.add_argument('--results', required=True, help='Path to results JSON file')
     parser.add_argument('--output', help='Path to output JSON file (default: results_with_eval.json)')
-    parser.add_argument('--mode', choices=['serial', 'parallel'], default='serial', help='Evaluation mode')
+    parser.add_argument('--mode', choices=['serial', 'parallel', 'batch'], default='serial',
+                        help='Evaluation mode; batch submits an OpenAI Batch API job and waits for it')
     parser.add_argument('--max-workers', type=int, default=4, help='Max workers for parallel evaluation')
+    parser.add_argument('--batch-size', type=int, default=1, help='Tasks per judge request in serial and parallel modes (ignored in batch mode)')
+    parser.add_argument('--fuse-judges', action='store_true',
+                        help='Judge screenshots and HTML in one gpt-4o request per task (ignored with --batch-size > 1)')
+    parser.add_argument('--judge-model', help='Model for the HTML judge (default: $DOME_JUDGE_MODEL or gpt-4o-mini)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip tasks already evaluated in the .jsonl checkpoint an unfinished run left next to the output file')
+    parser.add_argument('--image-urls', help='JSON file mapping local screenshot paths to hosted URLs')
     args = parser.parse_args()
 
     # Set up paths
@@ -45,6 +54,11 @@ def main():
     results = load_results(results_file)
     logging.info(f"Loaded {len(results)} results from {results_file}")
 
+    # Send hosted screenshots by URL instead of inlining them
+    if args.image_urls:
+        with open(args.image_urls, 'rb') as f:
+            register_image_urls(orjson.loads(f.read()))
+
     # Get OpenAI API key
     openai_key = os.getenv('OPENAI_API_KEY')
     if not openai_key:
@@ -52,18 +66,33 @@ def main():
 
     try:
         # Run evaluations
-        eval_results = run_evaluation(
-            tasks_file=tasks_file,
-            results_dir=results_file,
-            output_file=None,  # Don't save intermediate results
-            openai_key=openai_key,
-            max_workers=args.max_workers if args.mode == 'parallel' else None
-        )
+        if args.mode == 'batch':
+            eval_results = run_batch_evaluation(
+                tasks_file=tasks_file,
+                results_dir=results_file,
+                output_file=None,  # Don't save intermediate results
+                openai_key=openai_key,
+                judge_model=args.judge_model
+            )
+        else:
+            eval_results = run_evaluation(
+                tasks_file=tasks_file,
+                results_dir=results_file,
+                output_file=None,  # Don't save intermediate results
+                openai_key=openai_key,
+                max_workers=args.max_workers if args.mode == 'parallel' else None,
+                batch_size=args.batch_size,
+                judge_model=args.judge_model,
+                checkpoint_file=output_file.with_suffix('.jsonl'),
+                resume=args.resume,
+                fused=args.fuse_judges
+            )
 
         # Update results with evaluations
+        eval_by_id = {e['task_id']: e for e in eval_results['evaluations']}
         for result in results:
             task_id = result['task_id']
-            eval_result = next((e for e in eval_results['evaluations'] if e['task_id'] == task_id), None)
+            eval_result = eval_by_id.get(task_id)
             if eval_result:
                 # Get evaluation scores and explanations
                 result['visual_score'] = eval_result.get('visual_score', 0.0)
@@ -77,7 +106,7 @@ def main():
         logging.info(f"Saved evaluated results to {output_file}")
 
         # Print summary
-        total_score = sum(r.get('total_score', 0.0) for r in results) / len(results)
+        total_score = sum(r.get('total_score', 0.0) for r in results) / len(results) if results else 0.0
         logging.info(f"Average score across {len(results)} tasks: {total_score:.2f}")
 
     except Exception as e:
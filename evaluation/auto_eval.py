@@ -1,43 +1,435 @@
+import os
+import asyncio
 import logging
-import json
+import orjson
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
-from openai import OpenAI
-import time
-
-from evaluation.image_match import compare_images
-from evaluation.fuzzy_match import fuzzy_match_html
-from evaluation.parallel_eval import run_parallel_evaluation
-
-def retry_api_call(func, max_retries=3, initial_wait=1):
-    """Retry API calls with exponential backoff"""
-    def wrapper(*args, **kwargs):
-        retries = 0
-        while retries < max_retries:
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                retries += 1
-                if retries == max_retries:
-                    raise e
-                wait_time = initial_wait * (2 ** (retries - 1))
-                logging.warning(f"API call failed, retrying in {wait_time}s. Error: {str(e)}")
-                time.sleep(wait_time)
-    return wrapper
-
-@retry_api_call
-def evaluate_visual(client: OpenAI, prompt: str, ground_truth_path: str, agent_image_path: str) -> Tuple[bool, str]:
-    return compare_images(prompt=prompt, 
-                        ground_truth_path=ground_truth_path,
-                        agent_image_path=agent_image_path,
-                        openai_client=client)
-
-@retry_api_call
-def evaluate_html(client: OpenAI, task_description: str, actual_html: str, expected_html: str) -> Tuple[bool, str]:
-    return fuzzy_match_html(task_description=task_description,
-                          actual_html=actual_html,
-                          expected_html=expected_html,
-                          openai_client=client)
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DEFAULT_CONNECTION_LIMITS
+from dotenv import load_dotenv
+
+try:
+    # Optional faster event loop (pip install "dom-and-domer-2[fast]")
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from evaluation.image_match import (
+    compare_images, compare_images_batch, get_image_url, build_image_request, parse_image_verdict, prejudge_images
+)
+from evaluation.fuzzy_match import (
+    fuzzy_match_html, fuzzy_match_html_batch, build_html_request, parse_html_verdict, prejudge_html
+)
+from evaluation.fused_match import judge_task
+from evaluation.cache import request_key, get_cached, put_cached
+from evaluation import rate_limit
+from evaluation.rate_limit import JUDGE_MAX_RETRIES, JUDGE_TIMEOUT
+
+load_dotenv()
+
+# Per-task reasoning is printed only when DOME_VERBOSE is set; with many
+# tasks in flight the output is unreadable anyway and the reasoning is
+# saved with the evaluations
+VERBOSE = bool(os.getenv("DOME_VERBOSE"))
+
+def _run(coro):
+    """Run a coroutine to completion, on uvloop when it is installed"""
+    if uvloop is not None:
+        return uvloop.run(coro)
+    return asyncio.run(coro)
+
+def iter_tasks(tasks_file: Path) -> Iterator[Dict[str, Any]]:
+    """Stream tasks from a JSONL file, parsing each line as it is reached"""
+    with open(tasks_file, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
+
+def load_results(results_file: Path) -> Dict[str, Dict[str, Any]]:
+    """Load agent results keyed by task id"""
+    results = orjson.loads(results_file.read_bytes())
+    if not isinstance(results, list):
+        results = [results]
+    return {r['task_id']: r for r in results if r.get('task_id') is not None}
+
+def _task_description(task: Dict[str, Any]) -> str:
+    return f"{task['task']}\nInteraction: {task['interaction']}\nExpected: {task.get('expected_outcome', 'Complete the task as specified')}"
+
+def _build_evaluation(
+    task_id: str,
+    result: Dict[str, Any],
+    visual: Tuple[bool, str],
+    html: Tuple[bool, str]
+) -> Dict[str, Any]:
+    """Score one task from its visual and HTML verdicts"""
+    visual_correctness, visual_reasoning = visual
+    html_correctness, html_reasoning = html
+    
+    # Convert bool to float for scoring
+    visual_score = 1.0 if visual_correctness else 0.0
+    html_score = 1.0 if html_correctness else 0.0
+    final_score = (0.8 * visual_score) + (0.2 * html_score)
+
+    evaluation = {
+        "task_id": task_id,
+        "success": result["success"],
+        "error": result.get("error", None),
+        "visual_score": visual_score,
+        "html_score": html_score,
+        "final_score": final_score,
+        "visual_reasoning": visual_reasoning,
+        "html_reasoning": html_reasoning
+    }
+    
+    # Only log the LLM reasoning, and only when asked to
+    if VERBOSE:
+        print(f"\nTask {task_id} Evaluation:")
+        print(f"Visual Reasoning: {visual_reasoning}")
+        print(f"HTML Reasoning: {html_reasoning}")
+        print(f"Final Score: {final_score:.2f}\n")
+    
+    return evaluation
+
+# Reasoning recorded when a task's judge calls raised instead of returning a verdict
+FAILED_REASONING = "Evaluation failed"
+
+def _failed_evaluation(task_id: str, e: Exception) -> Dict[str, Any]:
+    return {
+        "task_id": task_id,
+        "success": False,
+        "error": str(e),
+        "visual_score": 0.0,
+        "html_score": 0.0,
+        "final_score": 0.0,
+        "visual_reasoning": f"{FAILED_REASONING}: {str(e)}",
+        "html_reasoning": f"{FAILED_REASONING}: {str(e)}"
+    }
+
+def _verdict_or_error(verdict, kind: str) -> Tuple[bool, str]:
+    """Turn an exception returned by asyncio.gather into a failed verdict"""
+    if isinstance(verdict, BaseException):
+        return False, f"Error comparing {kind}: {str(verdict)}"
+    return verdict
+
+def _html_pair(task: Dict[str, Any], result: Dict[str, Any]) -> Tuple[str, str]:
+    """The (actual, expected) HTML for a task; a missing actual element is sent as empty HTML"""
+    return result.get("html_element") or "", task.get('target_html', '')
+
+def _html_check(
+    description: str,
+    task: Dict[str, Any],
+    result: Dict[str, Any],
+    client: AsyncOpenAI,
+    judge_model: Optional[str] = None
+):
+    actual_html, expected_html = _html_pair(task, result)
+    return fuzzy_match_html(
+        task_description=description,
+        actual_html=actual_html,
+        expected_html=expected_html,
+        openai_client=client,
+        model=judge_model
+    )
+
+def _agent_image(result: Dict[str, Any]) -> str:
+    return result.get("after_screenshot", result.get("before_screenshot"))
+
+async def evaluate_task(
+    task: Dict[str, Any],
+    result: Dict[str, Any],
+    client: AsyncOpenAI,
+    judge_model: Optional[str] = None,
+    fused: bool = False
+) -> Dict[str, Any]:
+    """Evaluate a single task, running the visual and HTML checks concurrently.
+
+    With fused, both checks share one gpt-4o request instead.
+    """
+    task_id = task['id']
+    try:
+        # Built once and shared by both checks
+        description = _task_description(task)
+        if fused:
+            visual, html = await judge_task(
+                description,
+                task['ground_truth']['screenshot'],
+                _agent_image(result),
+                *_html_pair(task, result),
+                openai_client=client,
+                html_model=judge_model
+            )
+            return _build_evaluation(task_id, result, visual, html)
+        
+        # Always attempt visual evaluation using ground truth
+        visual, html = await asyncio.gather(
+            compare_images(
+                prompt=f"Task: {description}",
+                ground_truth_path=task['ground_truth']['screenshot'],
+                agent_image_path=_agent_image(result),
+                openai_client=client
+            ),
+            _html_check(description, task, result, client, judge_model),
+            return_exceptions=True
+        )
+        # A failing check only zeroes its own score
+        return _build_evaluation(
+            task_id, result, _verdict_or_error(visual, "images"), _verdict_or_error(html, "HTML")
+        )
+    except Exception as e:
+        return _failed_evaluation(task_id, e)
+
+async def evaluate_batch(
+    task_pairs: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+    client: AsyncOpenAI,
+    judge_model: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Evaluate several tasks with one visual and one HTML request, amortizing their round trips"""
+    try:
+        descriptions = [_task_description(task) for task, _ in task_pairs]
+        items = [
+            (f"Task: {description}", task['ground_truth']['screenshot'], _agent_image(result))
+            for description, (task, result) in zip(descriptions, task_pairs)
+        ]
+        actual_htmls, expected_htmls = zip(*(_html_pair(task, result) for task, result in task_pairs))
+        visuals, htmls = await asyncio.gather(
+            compare_images_batch(items, openai_client=client),
+            fuzzy_match_html_batch(
+                descriptions,
+                list(actual_htmls),
+                list(expected_htmls),
+                openai_client=client,
+                model=judge_model
+            ),
+            return_exceptions=True
+        )
+        if isinstance(visuals, BaseException):
+            visuals = [_verdict_or_error(visuals, "images")] * len(task_pairs)
+        if isinstance(htmls, BaseException):
+            htmls = [_verdict_or_error(htmls, "HTML")] * len(task_pairs)
+        return [
+            _build_evaluation(task['id'], result, visual, html)
+            for (task, result), visual, html in zip(task_pairs, visuals, htmls)
+        ]
+    except Exception as e:
+        return [_failed_evaluation(task['id'], e) for task, _ in task_pairs]
+
+def _failed_batch(batch: List[Tuple[Dict[str, Any], Dict[str, Any]]], e: BaseException) -> List[Dict[str, Any]]:
+    return [{
+        "task_id": task['id'],
+        "success": False,
+        "visual_score": 0.0,
+        "html_score": 0.0,
+        "final_score": 0.0,
+        "error": str(e)
+    } for task, _ in batch]
+
+def read_checkpoint(checkpoint_file: Path) -> Dict[str, Dict[str, Any]]:
+    """Load evaluations written so far, keyed by task id; later lines win"""
+    evaluations = {}
+    if checkpoint_file.exists():
+        with open(checkpoint_file, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    evaluation = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # A run killed mid-write can leave a partial last line
+                    continue
+                evaluations[evaluation['task_id']] = evaluation
+    return evaluations
+
+# Reasoning prefixes of verdicts that came from an error rather than the judge
+ERROR_REASONING = (FAILED_REASONING, "Error comparing")
+
+def _is_finished(evaluation: Dict[str, Any]) -> bool:
+    """Whether a checkpointed evaluation has real verdicts, rather than errors worth retrying"""
+    return not any(
+        evaluation.get(key, FAILED_REASONING).startswith(ERROR_REASONING)
+        for key in ("visual_reasoning", "html_reasoning")
+    )
+
+# The SDK's pool limits, but idle connections are kept for 30s instead of 5s
+# so the prewarmed connection is still open when the first judge calls go out
+CONNECTION_LIMITS = type(DEFAULT_CONNECTION_LIMITS)(
+    max_connections=DEFAULT_CONNECTION_LIMITS.max_connections,
+    max_keepalive_connections=DEFAULT_CONNECTION_LIMITS.max_keepalive_connections,
+    keepalive_expiry=30.0
+)
+
+def get_client(openai_key: str, http_client=None) -> AsyncOpenAI:
+    """Build the judge client shared by every call in a run.
+
+    One client per run keeps a single connection pool warm for all judge
+    calls. It is not kept between runs because its pool belongs to the
+    event loop that is closed at the end of each one.
+    """
+    if http_client is None:
+        # One HTTP/2 connection multiplexes the concurrent judge calls instead of
+        # each in-flight request holding its own HTTP/1.1 connection
+        http_client = DefaultAsyncHttpxClient(http2=True, limits=CONNECTION_LIMITS)
+    return AsyncOpenAI(
+        api_key=openai_key, http_client=http_client, max_retries=JUDGE_MAX_RETRIES, timeout=JUDGE_TIMEOUT
+    )
+
+async def _prewarm(client: AsyncOpenAI, http_client, openai_key: str):
+    """Open the API connection (TCP, TLS, HTTP/2) once before the judge calls start"""
+    try:
+        await http_client.head(
+            f"{str(client.base_url).rstrip('/')}/models",
+            headers={"Authorization": f"Bearer {openai_key}"},
+            timeout=5
+        )
+    except Exception as e:
+        # Only an optimization; the first real request connects instead
+        logging.debug("Connection prewarm failed: %s", e)
+
+async def _evaluate_tasks(
+    tasks: Iterable[Dict[str, Any]],
+    results_by_id: Dict[str, Dict[str, Any]],
+    openai_key: str,
+    max_workers: int,
+    batch_size: int = 1,
+    judge_model: Optional[str] = None,
+    checkpoint_file: Optional[Path] = None,
+    resume: bool = False,
+    fused: bool = False
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Evaluate tasks as they are read, keeping at most max_workers requests in flight.
+
+    With batch_size > 1, consecutive tasks share one visual and one HTML request. With a
+    checkpoint_file, each evaluation is appended to it as a JSON line as soon as it completes,
+    and resume skips tasks it already holds verdicts for. Returns the evaluations in completion
+    order and the number of tasks read.
+    """
+    task_count = 0
+    evaluations = []
+    finished = set()
+    if checkpoint_file and resume:
+        finished = {task_id for task_id, e in read_checkpoint(checkpoint_file).items() if _is_finished(e)}
+        if finished:
+            logging.info("Resuming: %d tasks already evaluated in %s", len(finished), checkpoint_file)
+    
+    def task_pairs():
+        nonlocal task_count
+        for task in tasks:
+            task_count += 1
+            if task['id'] in finished:
+                continue
+            result = results_by_id.get(task['id'])
+            if result:
+                yield task, result
+    
+    http_client = DefaultAsyncHttpxClient(http2=True, limits=CONNECTION_LIMITS)
+    async with get_client(openai_key, http_client) as client:
+        await _prewarm(client, http_client, openai_key)
+        
+        async def evaluate(batch):
+            if len(batch) == 1:
+                return [await evaluate_task(*batch[0], client, judge_model, fused)]
+            return await evaluate_batch(batch, client, judge_model)
+        
+        in_flight = {}
+        checkpoint = None
+        if checkpoint_file:
+            checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+            checkpoint = open(checkpoint_file, 'ab' if resume else 'wb')
+            if resume:
+                # Terminate any partial line left by an interrupted run
+                checkpoint.write(b'\n')
+        
+        def collect(done):
+            # Runs on the event loop between awaits, so writes never interleave
+            for future in done:
+                batch = in_flight.pop(future)
+                if future.exception() is not None:
+                    completed = _failed_batch(batch, future.exception())
+                else:
+                    completed = future.result()
+                if checkpoint:
+                    checkpoint.write(b''.join(orjson.dumps(e) + b'\n' for e in completed))
+                    checkpoint.flush()
+                else:
+                    evaluations.extend(completed)
+        
+        # Sliding window: start a new batch only when one finishes, so memory
+        # stays bounded by max_workers rather than the number of tasks
+        try:
+            pairs = task_pairs()
+            while True:
+                batch = list(islice(pairs, batch_size))
+                if not batch:
+                    break
+                if len(in_flight) >= max_workers:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    collect(done)
+                in_flight[asyncio.ensure_future(evaluate(batch))] = batch
+            
+            if in_flight:
+                done, _ = await asyncio.wait(in_flight)
+                collect(done)
+        finally:
+            if checkpoint:
+                checkpoint.close()
+    
+    if checkpoint_file:
+        # Verdicts were kept on disk rather than in memory; read them back
+        # together with the ones from earlier runs
+        evaluations = list(read_checkpoint(checkpoint_file).values())
+    return evaluations, task_count
+
+def run_evaluation(
+    tasks_file: Path,
+    results_dir: Path,
+    output_file: Path,
+    openai_key: str,
+    max_workers: Optional[int] = None,
+    batch_size: int = 1,
+    judge_model: Optional[str] = None,
+    checkpoint_file: Optional[Path] = None,
+    resume: bool = False,
+    fused: bool = False,
+    requests_per_minute: Optional[float] = None,
+    burst: Optional[int] = None
+) -> Dict[str, Any]:
+    """Run evaluation on task results, with up to max_workers requests in flight.
+
+    Leaving max_workers unset evaluates one task at a time. judge_model picks the
+    HTML judge model (default: DOME_JUDGE_MODEL, else gpt-4o-mini). Evaluations are
+    streamed to checkpoint_file (default: output_file with a .jsonl suffix) as they
+    complete and removed once every task has a verdict; with resume, tasks already
+    evaluated there are skipped. With fused, each task's visual and HTML checks share
+    one gpt-4o request (batch_size > 1 takes precedence). requests_per_minute and
+    burst bound the judge calls (default: DOME_JUDGE_RPM and DOME_JUDGE_BURST).
+    """
+    rate_limit.reset(requests_per_minute, burst)
+    results_by_id = load_results(results_dir)
+    if checkpoint_file is None and output_file:
+        checkpoint_file = output_file.with_suffix('.jsonl')
+    
+    # Tasks are streamed into the event loop; the calls are network-bound so
+    # they overlap on the shared client's connection pool
+    evaluations, task_count = _run(_evaluate_tasks(
+        iter_tasks(tasks_file), results_by_id, openai_key, max_workers or 1, batch_size, judge_model,
+        checkpoint_file, resume, fused
+    ))
+    
+    evaluation_results = {
+        "total_tasks": task_count,
+        "successful_tasks": sum(1 for e in evaluations if e.get("success", False)),
+        "evaluations": evaluations
+    }
+    
+    # Save evaluations if output file is provided
+    if output_file:
+        output_file.write_bytes(orjson.dumps(evaluation_results, option=orjson.OPT_INDENT_2))
+    
+    # The returned results hold every verdict; keep the checkpoint only while
+    # some tasks have errors that a resumed run would retry
+    if checkpoint_file and all(_is_finished(e) for e in evaluations):
+        checkpoint_file.unlink(missing_ok=True)
+            
+    return evaluation_results
 
 def run_serial_evaluation(
     tasks_file: Path,
@@ -46,89 +438,149 @@ def run_serial_evaluation(
     openai_key: str
 ) -> Dict[str, Any]:
     """Run evaluation on task results serially"""
-    # Initialize OpenAI client
-    client = OpenAI(api_key=openai_key)
-    
-    # Load tasks and results
-    with tasks_file.open() as f:
-        tasks = [json.loads(line) for line in f if line.strip()]
+    return run_evaluation(tasks_file, results_dir, output_file, openai_key, max_workers=1)
+
+# Batch jobs end in one of these states
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+async def _run_batch(
+    requests: Dict[str, Dict[str, Any]],
+    client: AsyncOpenAI,
+    poll_interval: float
+) -> Dict[str, str]:
+    """Submit chat requests as one Batch API job and return reply text by custom_id"""
+    lines = b"\n".join(
+        orjson.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+        for custom_id, body in requests.items()
+    )
+    input_file = await client.files.create(file=("evaluation_batch.jsonl", lines), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logging.info("Submitted batch %s with %d requests", batch.id, len(requests))
     
-    with results_dir.open() as f:
-        results = json.load(f)
-        if not isinstance(results, list):
-            results = [results]
+    while batch.status not in BATCH_FINAL_STATUSES:
+        await asyncio.sleep(poll_interval)
+        batch = await client.batches.retrieve(batch.id)
+        logging.info("Batch %s: %s", batch.id, batch.status)
     
-    evaluations = []
+    replies = {}
+    if batch.output_file_id:
+        output = await client.files.content(batch.output_file_id)
+        for line in output.content.splitlines():
+            if not line.strip():
+                continue
+            entry = orjson.loads(line)
+            response = entry.get("response") or {}
+            if response.get("status_code") == 200:
+                replies[entry["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return replies
+
+async def _evaluate_with_batch(
+    tasks: Iterable[Dict[str, Any]],
+    results_by_id: Dict[str, Dict[str, Any]],
+    openai_key: str,
+    poll_interval: float,
+    judge_model: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], int]:
+    task_count = 0
+    pairs = []
+    verdicts = {}
+    requests = {}
     for task in tasks:
+        task_count += 1
+        result = results_by_id.get(task['id'])
+        if not result:
+            continue
+        pairs.append((task, result))
         task_id = task['id']
-        result = next((r for r in results if r.get('task_id') == task_id), None)
-        if result:
+        description = _task_description(task)
+        
+        agent_image = _agent_image(result)
+        if not agent_image or not os.path.exists(agent_image):
+            verdicts[f"{task_id}:visual"] = (False, "Agent did not generate an image or wrong path")
+        else:
             try:
-                # Visual evaluation using compare_images with retry
-                visual_correctness, visual_reasoning = evaluate_visual(
-                    client,
-                    prompt=f"Task: {task['task']}\nInteraction: {task['interaction']}\nExpected: {task.get('expected_outcome', 'Complete the task as specified')}",
-                    ground_truth_path=task['ground_truth']['screenshot'],
-                    agent_image_path=result["after_screenshot"]
-                )
-                
-                # HTML comparison using fuzzy_match with retry
-                html_correctness, html_reasoning = evaluate_html(
-                    client,
-                    task_description=f"{task['task']}\nInteraction: {task['interaction']}\nExpected: {task.get('expected_outcome', 'Complete the task as specified')}",
-                    actual_html=result.get("html_element", ""),
-                    expected_html=task.get('target_html', '')
-                )
-
-                # Convert bool to float for scoring
-                visual_score = 1.0 if visual_correctness else 0.0
-                html_score = 1.0 if html_correctness else 0.0
-
-                # Combine scores and create evaluation
-                evaluation = {
-                    "task_id": task_id,
-                    "success": result["success"],
-                    "visual_score": visual_score,
-                    "html_score": html_score,
-                    "final_score": (0.8 * visual_score + 0.2 * html_score),
-                    "visual_reasoning": visual_reasoning,
-                    "html_reasoning": html_reasoning
-                }
-                evaluations.append(evaluation)
-                logging.info(f"Evaluated task {task_id}: score={evaluation.get('final_score', 0.0):.2f}")
-            except Exception as e:
-                logging.error(f"Error evaluating task {task_id}: {str(e)}")
-                evaluations.append({
-                    "task_id": task_id,
-                    "success": False,
-                    "visual_score": 0.0,
-                    "html_score": 0.0,
-                    "final_score": 0.0,
-                    "error": str(e)
-                })
+                visual_verdict = prejudge_images(task['ground_truth']['screenshot'], agent_image)
+                if visual_verdict is not None:
+                    verdicts[f"{task_id}:visual"] = visual_verdict
+                else:
+                    requests[f"{task_id}:visual"] = build_image_request(
+                        f"Task: {description}",
+                        get_image_url(task['ground_truth']['screenshot']),
+                        get_image_url(agent_image)
+                    )
+            except (OSError, KeyError) as e:
+                verdicts[f"{task_id}:visual"] = (False, f"Error comparing images: {str(e)}")
+        actual_html, expected_html = _html_pair(task, result)
+        html_verdict = prejudge_html(actual_html, expected_html)
+        if html_verdict is not None:
+            verdicts[f"{task_id}:html"] = html_verdict
+        else:
+            requests[f"{task_id}:html"] = build_html_request(
+                description, actual_html, expected_html, model=judge_model
+            )
+    
+    # Requests answered by an earlier run are not resubmitted
+    keys = {custom_id: request_key(**body) for custom_id, body in requests.items()}
+    replies = {}
+    for custom_id, key in keys.items():
+        cached = get_cached(key)
+        if cached is not None:
+            replies[custom_id] = cached
+    
+    pending = {custom_id: body for custom_id, body in requests.items() if custom_id not in replies}
+    if pending:
+        async with get_client(openai_key) as client:
+            batch_replies = await _run_batch(pending, client, poll_interval)
+        for custom_id, content in batch_replies.items():
+            put_cached(keys[custom_id], content)
+        replies.update(batch_replies)
+    
+    for custom_id in requests:
+        if custom_id not in replies:
+            kind = "images" if custom_id.endswith(":visual") else "HTML"
+            verdicts[custom_id] = (False, f"Error comparing {kind}: no batch result")
+        elif custom_id.endswith(":visual"):
+            verdicts[custom_id] = parse_image_verdict(replies[custom_id])
+        else:
+            verdicts[custom_id] = parse_html_verdict(replies[custom_id])
+    
+    evaluations = [
+        _build_evaluation(task['id'], result, verdicts[f"{task['id']}:visual"], verdicts[f"{task['id']}:html"])
+        for task, result in pairs
+    ]
+    return evaluations, task_count
+
+def run_batch_evaluation(
+    tasks_file: Path,
+    results_dir: Path,
+    output_file: Path,
+    openai_key: str,
+    poll_interval: float = 30,
+    judge_model: Optional[str] = None
+) -> Dict[str, Any]:
+    """Run evaluation through the OpenAI Batch API.
+
+    Half the cost of live requests and outside the interactive rate limits, but
+    results can take up to the 24h completion window.
+    """
+    results_by_id = load_results(results_dir)
+    
+    evaluations, task_count = _run(_evaluate_with_batch(
+        iter_tasks(tasks_file), results_by_id, openai_key, poll_interval, judge_model
+    ))
     
     evaluation_results = {
-        "total_tasks": len(tasks),
+        "total_tasks": task_count,
         "successful_tasks": sum(1 for e in evaluations if e.get("success", False)),
         "evaluations": evaluations
     }
     
     # Save evaluations if output file is provided
     if output_file:
-        with output_file.open('w') as f:
-            json.dump(evaluation_results, f, indent=2)
+        output_file.write_bytes(orjson.dumps(evaluation_results, option=orjson.OPT_INDENT_2))
             
     return evaluation_results
-
-def run_evaluation(
-    tasks_file: Path,
-    results_dir: Path,
-    output_file: Path,
-    openai_key: str,
-    max_workers: int = None
-) -> Dict[str, Any]:
-    """Run evaluation on task results using either serial or parallel mode"""
-    if max_workers:
-        return run_parallel_evaluation(tasks_file, results_dir, output_file, openai_key, max_workers)
-    else:
-        return run_serial_evaluation(tasks_file, results_dir, output_file, openai_key)
@@ -0,0 +1,88 @@
+import os
+import time
+import asyncio
+import hashlib
+import tempfile
+import orjson
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+from openai import AsyncOpenAI
+
+from evaluation.rate_limit import create_chat_completion
+
+# Judge replies stored on disk, one JSON file per request hash
+CACHE_DIR = Path(os.getenv('DOME_EVAL_CACHE', Path.home() / '.cache' / 'dome_eval'))
+
+# Replies older than this are asked for again, e.g. to pick up changes behind
+# a model alias; 0 keeps them forever
+CACHE_TTL_HOURS = float(os.getenv('DOME_EVAL_CACHE_TTL_HOURS', 0))
+
+def request_key(**request) -> str:
+    """Hash a chat request. Images are inlined as data URLs, so their content is part of the key"""
+    return hashlib.sha256(orjson.dumps(request, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def _cache_path(key: str) -> Path:
+    return CACHE_DIR / key[:2] / f"{key}.json"
+
+def get_cached(key: str) -> Optional[str]:
+    """Return the cached reply for a request key, if any"""
+    try:
+        entry = orjson.loads(_cache_path(key).read_bytes())
+        if CACHE_TTL_HOURS and time.time() - entry.get('timestamp', 0) > CACHE_TTL_HOURS * 3600:
+            return None
+        return entry['content']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def write_atomic(path: Path, data: bytes):
+    """Write to a temp file and rename it into place so readers never see partial files"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def put_cached(key: str, content: str):
+    """Store a reply for a request key"""
+    write_atomic(_cache_path(key), orjson.dumps({'content': content, 'timestamp': time.time()}))
+
+# Recent replies kept in memory, so repeated prompts within a run skip the disk
+MEMORY_CACHE_SIZE = 1024
+_memory = OrderedDict()
+
+# Requests currently being sent, so identical prompts in flight at the same
+# time share one API call instead of all missing the cache
+_pending: Dict[str, asyncio.Future] = {}
+
+def _remember(key: str, content: str):
+    _memory[key] = content
+    _memory.move_to_end(key)
+    if len(_memory) > MEMORY_CACHE_SIZE:
+        _memory.popitem(last=False)
+
+async def _fetch(client: AsyncOpenAI, key: str, request: dict) -> str:
+    response = await create_chat_completion(client, **request)
+    content = response.choices[0].message.content
+    put_cached(key, content)
+    return content
+
+async def cached_completion_text(client: AsyncOpenAI, **request) -> str:
+    """Return the reply text for a chat request, only calling the API on a cache miss"""
+    key = request_key(**request)
+    content = _memory.get(key)
+    if content is None:
+        content = get_cached(key)
+    if content is None:
+        pending = _pending.get(key)
+        if pending is None:
+            pending = _pending[key] = asyncio.ensure_future(_fetch(client, key, request))
+            pending.add_done_callback(lambda _: _pending.pop(key, None))
+        # Shielded so one waiter being cancelled does not cancel the call for the others
+        content = await asyncio.shield(pending)
+    _remember(key, content)
+    return content
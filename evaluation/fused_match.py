@@ -0,0 +1,128 @@
+import os
+import asyncio
+import orjson
+from openai import AsyncOpenAI
+
+from evaluation.cache import cached_completion_text
+from evaluation.verdict import VERDICT_MAX_TOKENS
+from evaluation.image_match import system_prompt as visual_prompt, compare_images, get_image_url, prejudge_images
+from evaluation.fuzzy_match import (
+    system_prompt as html_prompt, fuzzy_match_html, prejudge_html, truncate, MAX_HTML_TOKENS, MAX_TASK_TOKENS
+)
+
+# Both rubrics in one request; each judge's own output format is replaced by
+# a single JSON object carrying both verdicts
+system_prompt = f"""You are judging one web automation task in two independent parts.
+
+# Part 1: final screenshot
+{visual_prompt.partition("Your output should")[0].strip()}
+
+# Part 2: target element
+{html_prompt.partition("Your output should")[0].strip()}
+
+Your output should be a JSON object in the following format:
+{{"visual_correctness": true/false, "visual_reason": "<one sentence on whether the final state matches the expected outcome>", "html_correctness": true/false, "html_reason": "<one sentence on whether the correct element was targeted>"}}
+"""
+
+FUSED_VERDICT_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "fused_verdict",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "visual_correctness": {"type": "boolean"},
+                "visual_reason": {"type": "string"},
+                "html_correctness": {"type": "boolean"},
+                "html_reason": {"type": "string"}
+            },
+            "required": ["visual_correctness", "visual_reason", "html_correctness", "html_reason"],
+            "additionalProperties": False
+        }
+    }
+}
+
+def build_fused_request(task_description, ground_truth_url, agent_image_url, actual_html, expected_html, model="gpt-4o"):
+    """Chat completion parameters for judging both the screenshots and the HTML of one task."""
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": f"Task: {truncate(task_description, MAX_TASK_TOKENS)}\n\nGround truth screenshot, then final screenshot:"},
+                    {"type": "image_url", "image_url": {"url": ground_truth_url, "detail": "low"}},
+                    {"type": "image_url", "image_url": {"url": agent_image_url, "detail": "low"}},
+                    {
+                        "type": "text",
+                        "text": f"Expected HTML:\n{truncate(expected_html, MAX_HTML_TOKENS)}\n\n"
+                                f"Actual HTML:\n{truncate(actual_html, MAX_HTML_TOKENS)}"
+                    }
+                ]
+            }
+        ],
+        "response_format": FUSED_VERDICT_FORMAT,
+        "max_tokens": 2 * VERDICT_MAX_TOKENS,
+        "temperature": 0,
+    }
+
+async def judge_task(
+    task_description,
+    ground_truth_path,
+    agent_image_path,
+    actual_html,
+    expected_html,
+    openai_client: AsyncOpenAI = None,
+    model="gpt-4o",
+    html_model=None
+):
+    """Judge a task's screenshots and HTML with one request instead of two.
+
+    Returns the (correctness, reasoning) verdicts for the visual and the HTML
+    check. When the agent image is missing or a pre-pass already settles one
+    check, only the other one is sent, to its own judge.
+    """
+    if openai_client is None:
+        raise ValueError("OpenAI client must be provided")
+
+    loop = asyncio.get_running_loop()
+    if not agent_image_path or not os.path.exists(agent_image_path):
+        visual = (False, "Agent did not generate an image or wrong path")
+    else:
+        try:
+            visual = await loop.run_in_executor(None, prejudge_images, ground_truth_path, agent_image_path)
+        except Exception as e:
+            # Unreadable screenshots fail only the visual check
+            visual = (False, f"Error comparing images: {str(e)}")
+    html = prejudge_html(actual_html, expected_html)
+
+    if visual is not None or html is not None:
+        if visual is None:
+            visual = await compare_images(f"Task: {task_description}", ground_truth_path, agent_image_path, openai_client=openai_client, model=model)
+        if html is None:
+            html = await fuzzy_match_html(task_description, actual_html, expected_html, openai_client=openai_client, model=html_model)
+        return visual, html
+
+    try:
+        ground_truth_url, agent_image_url = await asyncio.gather(
+            loop.run_in_executor(None, get_image_url, ground_truth_path),
+            loop.run_in_executor(None, get_image_url, agent_image_path)
+        )
+    except Exception as e:
+        html = await fuzzy_match_html(task_description, actual_html, expected_html, openai_client=openai_client, model=html_model)
+        return (False, f"Error comparing images: {str(e)}"), html
+
+    try:
+        output = await cached_completion_text(
+            openai_client,
+            **build_fused_request(task_description, ground_truth_url, agent_image_url, actual_html, expected_html, model)
+        )
+        verdict = orjson.loads(output)
+        return (
+            (verdict["visual_correctness"] is True, verdict["visual_reason"]),
+            (verdict["html_correctness"] is True, verdict["html_reason"])
+        )
+    except Exception as e:
+        return (False, f"Error comparing images: {str(e)}"), (False, f"Error comparing HTML: {str(e)}")
@@ -1,8 +1,30 @@
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import re
+import logging
+import functools
+import orjson
+import tiktoken
+import lxml.html
+from collections import deque
+from lxml.etree import ParserError
+from typing import Optional
+from openai import AsyncOpenAI
 
-load_dotenv()
+from evaluation.cache import cached_completion_text
+from evaluation.verdict import VERDICT_FORMAT, VERDICT_MAX_TOKENS, batch_verdict_format, parse_verdict
+
+# A short classification, so a small model is enough; DOME_JUDGE_MODEL
+# overrides it (e.g. gpt-4o for a gold re-evaluation)
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Inputs longer than these are cut before they are put in the prompt
+MAX_HTML_TOKENS = 500  # Tokens per HTML string
+MAX_TASK_TOKENS = 125  # Tokens for task description
+
+# Tokenizer of the gpt-4o family; if it cannot be loaded (it is downloaded
+# on first use), inputs are cut by characters at this rough ratio instead
+TOKEN_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4
 
 system_prompt = """
 You are evaluating if a web automation task interacted with the correct HTML element. Your goal is to verify that the agent interacted with the intended element based on the task description and HTML.
@@ -14,29 +36,97 @@ Guidelines:
 4. Ignore differences in element state or content after interaction
 5. For forms/inputs, verify the correct input field was targeted
 
-Your output should be in the following format:
-Correctness: [True/False]
-Reason: [Explain if the correct element was targeted based on HTML attributes and type]
+Your output should be a JSON object in the following format:
+{"correctness": true/false, "reason": "<one sentence on whether the correct element was targeted, based on HTML attributes and type>"}
+"""
+
+# Same guidelines, but several cases per request with one JSON verdict each
+batch_system_prompt = system_prompt.partition("Your output should")[0] + """You will be given several numbered cases, each with its own task, expected HTML and actual HTML.
+Evaluate every case independently.
+
+Your output should be a JSON object in the following format:
+{"results": [{"id": <case number>, "correctness": true/false, "reason": "<one sentence on whether the correct element was targeted>"}]}
 """
 
-def fuzzy_match_html(
+def _collapse(text: Optional[str]) -> str:
+    return " ".join(text.split()) if text else ""
+
+def _canonical(html: str) -> list:
+    """Parse an HTML fragment into a comparable form, ignoring attribute order and whitespace"""
+    canonical = []
+    for fragment in lxml.html.fragments_fromstring(html):
+        if isinstance(fragment, str):
+            canonical.append(_collapse(fragment))
+            continue
+        canonical.extend(
+            (str(el.tag).lower(), sorted(el.attrib.items()), _collapse(el.text), _collapse(el.tail))
+            for el in fragment.iter()
+        )
+    return canonical
+
+def _root_tag(html: str) -> Optional[str]:
+    """Tag of an HTML fragment that is a single element, else None"""
+    fragments = lxml.html.fragments_fromstring(html)
+    if len(fragments) == 1 and not isinstance(fragments[0], str):
+        return str(fragments[0].tag).lower()
+    return None
+
+def prejudge_html(actual_html: str, expected_html: str) -> Optional[tuple[bool, str]]:
+    """Settle trivially equal or unambiguously different elements without the LLM judge.
+
+    Returns a verdict, or None when the pair needs the judge.
+    """
+    if not actual_html.strip() or not expected_html.strip():
+        return None
+    try:
+        if _canonical(actual_html) == _canonical(expected_html):
+            return True, "Actual HTML matches the expected element exactly"
+        actual_tag, expected_tag = _root_tag(actual_html), _root_tag(expected_html)
+    except (ParserError, ValueError):
+        # Empty or unparseable HTML; leave it to the judge
+        return None
+    if actual_tag and expected_tag and actual_tag != expected_tag:
+        return False, f"Tag mismatch: expected <{expected_tag}>, got <{actual_tag}>"
+    return None
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        logging.warning("Could not load the %s tokenizer, truncating by characters: %s", TOKEN_ENCODING, e)
+        return None
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens"""
+    # Every token covers at least one character, so short texts need no encoding
+    if len(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding is None:
+        limit = max_tokens * CHARS_PER_TOKEN
+        return text[:limit] + "..." if len(text) > limit else text
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[:max_tokens]) + "..." if len(tokens) > max_tokens else text
+
+def build_html_request(
     task_description: str,
     actual_html: str,
     expected_html: str,
     note: str = None,
-    openai_client: OpenAI = None
-) -> tuple[bool, str]:
-    """Compare HTML elements using GPT-4 for semantic understanding"""
-    
-    if openai_client is None:
-        raise ValueError("OpenAI client must be provided")
+    model: str = None
+) -> dict:
+    """Chat completion parameters for comparing one pair of HTML elements"""
+    # Truncate inputs if too long
+    actual_html = truncate(actual_html, MAX_HTML_TOKENS)
+    expected_html = truncate(expected_html, MAX_HTML_TOKENS)
+    task_description = truncate(task_description, MAX_TASK_TOKENS)
     
-    try:
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user", 
-                "content": f"""Task: {task_description}
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "user", 
+            "content": f"""Task: {task_description}
 
 Expected HTML:
 {expected_html}
@@ -45,42 +135,145 @@ Actual HTML:
 {actual_html}
 
 Additional Context: {note}"""
-            } if note else {
-                "role": "user", 
-                "content": f"""Task: {task_description}
+        } if note else {
+            "role": "user", 
+            "content": f"""Task: {task_description}
 
 Expected HTML:
 {expected_html}
 
 Actual HTML:
 {actual_html}"""
-            }
-        ]
+        }
+    ]
+    
+    return {
+        "model": model or os.getenv("DOME_JUDGE_MODEL", DEFAULT_MODEL),
+        "messages": messages,
+        "response_format": VERDICT_FORMAT,
+        "max_tokens": VERDICT_MAX_TOKENS,
+        "temperature": 0,
+    }
+
+def parse_html_verdict(output: str) -> tuple[bool, str]:
+    """Read the (correctness, reason) verdict from an HTML judge reply"""
+    try:
+        return parse_verdict(output)
+    except ValueError as e:
+        return False, f"Error comparing HTML: {str(e)}"
+
+# Opt-in reuse of a recent verdict for a near-duplicate case (a reworded task
+# on practically the same HTML); off by default because the verdict is not
+# re-checked against the new wording
+REUSE_SIMILAR = bool(os.getenv("DOME_REUSE_SIMILAR"))
+SIMILAR_TASK_THRESHOLD = 0.8  # Jaccard similarity of task description words
+SIMILAR_HTML_THRESHOLD = 0.9  # Jaccard similarity of HTML tokens, for each side
+_recent_verdicts = deque(maxlen=256)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+def _token_set(text: str) -> frozenset:
+    return frozenset(_WORD_PATTERN.findall(text.lower()))
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+def _similar_verdict(model: str, case: tuple) -> Optional[tuple[bool, str]]:
+    """A recent verdict for a case whose task and HTML are close enough to this one"""
+    for recent_model, recent_case, verdict in _recent_verdicts:
+        if recent_model != model:
+            continue
+        thresholds = (SIMILAR_TASK_THRESHOLD, SIMILAR_HTML_THRESHOLD, SIMILAR_HTML_THRESHOLD)
+        if all(_jaccard(a, b) >= t for a, b, t in zip(case, recent_case, thresholds)):
+            return verdict
+    return None
+
+async def fuzzy_match_html(
+    task_description: str,
+    actual_html: str,
+    expected_html: str,
+    note: str = None,
+    openai_client: AsyncOpenAI = None,
+    model: str = None
+) -> tuple[bool, str]:
+    """Compare HTML elements using an LLM judge for semantic understanding"""
+    
+    if openai_client is None:
+        raise ValueError("OpenAI client must be provided")
+    
+    verdict = prejudge_html(actual_html, expected_html)
+    if verdict is not None:
+        return verdict
+    
+    try:
+        request = build_html_request(task_description, actual_html, expected_html, note, model)
+        if REUSE_SIMILAR and not note:
+            case = (_token_set(task_description), _token_set(actual_html), _token_set(expected_html))
+            verdict = _similar_verdict(request["model"], case)
+            if verdict is not None:
+                return verdict
         
-        # Truncate inputs if too long
-        max_html_length = 2000  # Characters per HTML string
-        max_task_length = 500   # Characters for task description
+        output = await cached_completion_text(openai_client, **request)
+        verdict = parse_html_verdict(output)
+        if REUSE_SIMILAR and not note and not verdict[1].startswith("Error comparing"):
+            _recent_verdicts.append((request["model"], case, verdict))
+        return verdict
         
-        if len(actual_html) > max_html_length:
-            actual_html = actual_html[:max_html_length] + "..."
-            
-        if len(expected_html) > max_html_length:
-            expected_html = expected_html[:max_html_length] + "..."
-            
-        if len(task_description) > max_task_length:
-            task_description = task_description[:max_task_length] + "..."
-            
-        response = openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            max_tokens=300,
+    except Exception as e:
+        return False, f"Error comparing HTML: {str(e)}"
+
+async def fuzzy_match_html_batch(
+    task_descriptions: list[str],
+    actual_htmls: list[str],
+    expected_htmls: list[str],
+    openai_client: AsyncOpenAI = None,
+    model: str = None
+) -> list[tuple[bool, str]]:
+    """Compare several pairs of HTML elements in one request, one verdict per pair"""
+    
+    if openai_client is None:
+        raise ValueError("OpenAI client must be provided")
+    
+    verdicts = [prejudge_html(actual, expected) for actual, expected in zip(actual_htmls, expected_htmls)]
+    pending = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    if not pending:
+        return verdicts
+    
+    blocks = [
+        f"""## Case {n}
+Task: {truncate(task_descriptions[i], MAX_TASK_TOKENS)}
+
+Expected HTML:
+{truncate(expected_htmls[i], MAX_HTML_TOKENS)}
+
+Actual HTML:
+{truncate(actual_htmls[i], MAX_HTML_TOKENS)}"""
+        for n, i in enumerate(pending, start=1)
+    ]
+    
+    try:
+        output = await cached_completion_text(
+            openai_client,
+            model=model or os.getenv("DOME_JUDGE_MODEL", DEFAULT_MODEL),
+            messages=[
+                {"role": "system", "content": batch_system_prompt},
+                {"role": "user", "content": "\n\n".join(blocks)}
+            ],
+            response_format=batch_verdict_format("id"),
+            max_tokens=VERDICT_MAX_TOKENS * len(blocks),
+            temperature=0,
         )
-        
-        output = response.choices[0].message.content
-        correctness = "True" in output.split("\n")[0]
-        reason = "\n".join(output.split("\n")[1:])
-        
-        return correctness, reason.replace("Reason: ", "").strip()
+        by_id = {r.get("id"): r for r in orjson.loads(output)["results"]}
         
     except Exception as e:
-        return False, f"Error comparing HTML: {str(e)}"
+        for i in pending:
+            verdicts[i] = (False, f"Error comparing HTML: {str(e)}")
+        return verdicts
+    
+    for n, i in enumerate(pending, start=1):
+        verdict = by_id.get(n)
+        if verdict is None:
+            verdicts[i] = (False, "Error comparing HTML: no verdict returned for case")
+        else:
+            verdicts[i] = (verdict.get("correctness") is True, verdict.get("reason", ""))
+    return verdicts
@@ -1,10 +1,18 @@
 import os
-from openai import OpenAI
-import http.server
-import socketserver
-import threading
-import time
+import asyncio
+import orjson
+import pybase64
+import io
+import hashlib
+import functools
+import imagehash
+import numpy as np
+from openai import AsyncOpenAI
+
+from evaluation.cache import cached_completion_text
+from evaluation.verdict import VERDICT_FORMAT, VERDICT_MAX_TOKENS, batch_verdict_format, parse_verdict
 from pathlib import Path
+from PIL import Image
 
 system_prompt = """
 You are evaluating if a web automation task achieved its intended final state. Your goal is to compare the final screenshot with the expected ground truth image.
@@ -23,104 +31,237 @@ Guidelines:
 4. Don't try to verify the action being taken, only the end result
 5. Minor visual differences (e.g., slight layout shifts, different ads) are acceptable
 
-Your output should be in the following format:
-Correctness: [True/False]
-Reason: [Explain if the final state matches the expected outcome, focusing on key visual indicators of task completion]
+Your output should be a JSON object in the following format:
+{"correctness": true/false, "reason": "<one sentence on whether the final state matches the expected outcome, citing the key visual indicators of task completion>"}
 """
 
-class ImageServer:
-    def __init__(self, port=8000):
-        self.port = port
-        self.server = None
-        self.thread = None
-        
-    def start(self):
-        # Create a temporary directory for serving images
-        self.temp_dir = Path("temp_images")
-        self.temp_dir.mkdir(exist_ok=True)
-        
-        # Set up a simple HTTP server
-        handler = http.server.SimpleHTTPRequestHandler
-        self.server = socketserver.TCPServer(("", self.port), handler)
-        
-        # Run server in a separate thread
-        self.thread = threading.Thread(target=self.server.serve_forever)
-        self.thread.daemon = True
-        self.thread.start()
-        
-    def stop(self):
-        if self.server:
-            self.server.shutdown()
-            self.server.server_close()
-        if self.thread:
-            self.thread.join()
-            
-    def get_url(self, image_path):
-        # Copy image to temp directory with a unique name
-        unique_name = f"{int(time.time())}_{os.path.basename(image_path)}"
-        temp_path = self.temp_dir / unique_name
-        
-        # Copy the file
-        with open(image_path, 'rb') as src, open(temp_path, 'wb') as dst:
-            dst.write(src.read())
-            
-        return f"http://localhost:{self.port}/temp_images/{unique_name}"
+# Same guidelines, but several tasks per request with one JSON verdict each
+batch_system_prompt = system_prompt.partition("Your output should")[0] + """You will be given several numbered tasks, each followed by its ground truth image and then the final screenshot.
+Evaluate every task independently.
+
+Your output should be a JSON object in the following format:
+{"results": [{"task": <task number>, "correctness": true/false, "reason": "<one sentence on whether the final state matches the expected outcome>"}]}
+"""
+
+# Screenshots are judged at "low" detail, which the API processes at 512px,
+# so full-resolution PNGs only add upload bytes
+MAX_IMAGE_SIDE = 1024
+IMAGE_FORMAT = "JPEG"
+IMAGE_MIME_TYPE = "image/jpeg"
+IMAGE_QUALITY = 85
+
+def _encode_image(image_path):
+    with Image.open(image_path) as img:
+        img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.LANCZOS)
+        buffer = io.BytesIO()
+        # JPEG has no alpha channel or palette
+        img.convert("RGB").save(buffer, IMAGE_FORMAT, quality=IMAGE_QUALITY, optimize=True)
+    return pybase64.b64encode_as_string(buffer.getbuffer())
+
+@functools.lru_cache(maxsize=512)
+def _encode_cached(image_path, mtime_ns, size):
+    return _encode_image(image_path)
 
 def get_base64_image(image_path):
-    """Convert image to base64 string."""
-    import base64
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+    """Downscale an image and convert it to a base64 string.
+
+    Cached in memory by path, modification time and size, so ground truth
+    screenshots shared between tasks are read and encoded once, while a
+    screenshot rewritten during the run is encoded again.
+    """
+    stat = os.stat(image_path)
+    return _encode_cached(str(image_path), stat.st_mtime_ns, stat.st_size)
+
+# Pairs this far apart in perceptual hash (out of 64 bits) and this dissimilar
+# in structure are different pages; judging them needs no vision call
+PHASH_MISMATCH_DISTANCE = 30
+SSIM_MISMATCH = 0.3
+SSIM_SIDE = 64
+
+@functools.lru_cache(maxsize=512)
+def _fingerprint(image_path, mtime_ns, size):
+    with Image.open(image_path) as img:
+        img = img.convert("RGB")
+        pixels = hashlib.sha1(img.tobytes()).digest()
+        phash = imagehash.phash(img)
+        gray = np.asarray(img.convert("L").resize((SSIM_SIDE, SSIM_SIDE), Image.LANCZOS), dtype=np.float64)
+    return img.size, pixels, phash, gray
+
+def _ssim(x, y):
+    """Global structural similarity of two equally sized grayscale arrays"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mx, my = x.mean(), y.mean()
+    cov = ((x - mx) * (y - my)).mean()
+    return ((2 * mx * my + c1) * (2 * cov + c2)) / ((mx ** 2 + my ** 2 + c1) * (x.var() + y.var() + c2))
+
+def prejudge_images(ground_truth_path, agent_image_path):
+    """Settle identical or clearly different screenshots without the vision judge.
+
+    Returns a (correctness, reasoning) verdict, or None when the pair needs the judge.
+    """
+    fingerprints = []
+    for path in (ground_truth_path, agent_image_path):
+        stat = os.stat(path)
+        fingerprints.append(_fingerprint(str(path), stat.st_mtime_ns, stat.st_size))
+    (gt_size, gt_pixels, gt_phash, gt_gray), (agent_size, agent_pixels, agent_phash, agent_gray) = fingerprints
+    
+    # Only exact pixel matches pass here: near-identical hashes also cover
+    # pages that differ by a typed value or an opened menu, which the judge must see
+    if gt_size == agent_size and gt_pixels == agent_pixels:
+        return True, "Final screenshot is identical to the ground truth"
+    distance = gt_phash - agent_phash
+    if distance >= PHASH_MISMATCH_DISTANCE and _ssim(gt_gray, agent_gray) < SSIM_MISMATCH:
+        return False, f"Final screenshot shows a different page than the ground truth (perceptual hash distance {distance})"
+    return None
+
+# Screenshots that are already hosted (e.g. uploaded to a bucket), keyed by
+# local path; these are sent by URL instead of being inlined as base64
+_image_urls = {}
+
+def register_image_urls(url_map):
+    """Register hosted URLs for local screenshot paths."""
+    _image_urls.update({str(Path(path)): url for path, url in url_map.items()})
+
+def get_image_url(image_path):
+    """Return the hosted URL for an image, or an inline base64 data URL."""
+    url = _image_urls.get(str(Path(image_path)))
+    if url is None:
+        url = f"data:{IMAGE_MIME_TYPE};base64,{get_base64_image(image_path)}"
+    return url
+
+def build_image_request(prompt, ground_truth_url, agent_image_url, note=None, model="gpt-4o"):
+    """Chat completion parameters for comparing one pair of images."""
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "user", 
+            "content": [
+                {
+                    "type": "text", 
+                    "text": f"Task: {prompt}\n" + (f"Note: {note}\n" if note else "")
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": ground_truth_url,
+                        "detail": "low"
+                    }
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": agent_image_url,
+                        "detail": "low"
+                    }
+                }
+            ]
+        }
+    ]
+    return {
+        "model": model,
+        "messages": messages,
+        "response_format": VERDICT_FORMAT,
+        "max_tokens": VERDICT_MAX_TOKENS,
+        "temperature": 0,
+    }
+
+def parse_image_verdict(response_text):
+    """Read the (correctness, reason) verdict from a visual judge reply."""
+    try:
+        return parse_verdict(response_text)
+    except ValueError as e:
+        return False, f"Error comparing images: {str(e)}"
 
-def compare_images(prompt, ground_truth_path, agent_image_path, note=None, openai_client=None):
+async def compare_images(prompt, ground_truth_path, agent_image_path, note=None, openai_client=None, model="gpt-4o"):
     if openai_client is None:
         raise ValueError("OpenAI client must be provided")
         
-    if not os.path.exists(agent_image_path):
+    if not agent_image_path or not os.path.exists(agent_image_path):
         return False, "Agent did not generate an image or wrong path"
     
     try:
-        # Convert images to base64
-        ground_truth_b64 = get_base64_image(ground_truth_path)
-        agent_image_b64 = get_base64_image(agent_image_path)
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user", 
-                "content": [
-                    {
-                        "type": "text", 
-                        "text": f"Task: {prompt}\n" + (f"Note: {note}\n" if note else "")
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{ground_truth_b64}",
-                            "detail": "low"
-                        }
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{agent_image_b64}",
-                            "detail": "low"
-                        }
-                    }
-                ]
-            }
-        ]
+        # Reading and encoding screenshots blocks, so run it on worker threads
+        # to keep the event loop free for other in-flight requests
+        loop = asyncio.get_running_loop()
+        verdict = await loop.run_in_executor(None, prejudge_images, ground_truth_path, agent_image_path)
+        if verdict is not None:
+            return verdict
         
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
+        ground_truth_url, agent_image_url = await asyncio.gather(
+            loop.run_in_executor(None, get_image_url, ground_truth_path),
+            loop.run_in_executor(None, get_image_url, agent_image_path)
         )
         
-        response_text = response.choices[0].message.content
-        if "Correctness: True" in response_text:
-            return True, response_text
-        else:
-            return False, response_text
+        response_text = await cached_completion_text(
+            openai_client,
+            **build_image_request(prompt, ground_truth_url, agent_image_url, note, model)
+        )
+        return parse_image_verdict(response_text)
             
     except Exception as e:
         return False, f"Error comparing images: {str(e)}"
+
+async def compare_images_batch(items, openai_client=None, model="gpt-4o"):
+    """Compare several (prompt, ground_truth_path, agent_image_path) items in one request.
+
+    Returns a (correctness, reasoning) tuple per item, in order.
+    """
+    if openai_client is None:
+        raise ValueError("OpenAI client must be provided")
+    
+    verdicts = [None] * len(items)
+    pending = []
+    for i, (prompt, ground_truth_path, agent_image_path) in enumerate(items):
+        if agent_image_path and os.path.exists(agent_image_path):
+            pending.append(i)
+        else:
+            verdicts[i] = (False, "Agent did not generate an image or wrong path")
+    
+    loop = asyncio.get_running_loop()
+    prejudged = await asyncio.gather(*(
+        loop.run_in_executor(None, prejudge_images, items[i][1], items[i][2]) for i in pending
+    ), return_exceptions=True)
+    for i, verdict in zip(list(pending), prejudged):
+        if isinstance(verdict, tuple):
+            verdicts[i] = verdict
+            pending.remove(i)
+    if not pending:
+        return verdicts
+    
+    try:
+        urls = await asyncio.gather(*(
+            loop.run_in_executor(None, get_image_url, path)
+            for i in pending
+            for path in (items[i][1], items[i][2])
+        ))
+        
+        content = []
+        for n, i in enumerate(pending):
+            content.append({"type": "text", "text": f"## Task {n + 1}\nTask: {items[i][0]}"})
+            for url in urls[2 * n:2 * n + 2]:
+                content.append({"type": "image_url", "image_url": {"url": url, "detail": "low"}})
+        
+        response_text = await cached_completion_text(
+            openai_client,
+            model=model,
+            messages=[
+                {"role": "system", "content": batch_system_prompt},
+                {"role": "user", "content": content}
+            ],
+            response_format=batch_verdict_format("task"),
+            max_tokens=VERDICT_MAX_TOKENS * len(pending),
+            temperature=0,
+        )
+        
+        by_number = {r.get("task"): r for r in orjson.loads(response_text)["results"]}
+        for n, i in enumerate(pending):
+            verdict = by_number.get(n + 1)
+            if verdict is None:
+                verdicts[i] = (False, "Error comparing images: no verdict returned for task")
+            else:
+                verdicts[i] = (verdict.get("correctness") is True, verdict.get("reason", ""))
+    except Exception as e:
+        for i in pending:
+            verdicts[i] = (False, f"Error comparing images: {str(e)}")
+    
+    return verdicts
@@ -0,0 +1,94 @@
+import os
+import time
+import asyncio
+from openai import AsyncOpenAI, Timeout, RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
+
+# Retry budget and timeouts for judge clients; the SDK retries the
+# transient errors below and fails anything else (bad request, auth) at once
+JUDGE_MAX_RETRIES = 5
+JUDGE_TIMEOUT = Timeout(60, connect=5)
+
+# Judge request budget, shared by every judge call in a run; lower these to
+# match the account's rate limits
+JUDGE_RPM = float(os.getenv('DOME_JUDGE_RPM', 500))
+JUDGE_BURST = int(os.getenv('DOME_JUDGE_BURST', 10))
+
+# Errors that are transient, i.e. count towards the circuit breaker
+TRANSIENT_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+class RateLimiter:
+    """Token bucket shared by every judge call in the process.
+
+    Tokens refill continuously at the per-minute rate, so requests are
+    spread evenly over the minute instead of the whole budget going out
+    in one burst and then stalling; up to `burst` requests may start at once.
+    """
+    def __init__(self, max_requests_per_minute=JUDGE_RPM, burst=JUDGE_BURST):
+        self.rate = max_requests_per_minute / 60  # tokens per second
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        """Wait until a request can start within the rate limit"""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            # No await between the check and the decrement, so concurrent
+            # coroutines cannot both take the last token
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class CircuitBreaker:
+    """Stops retrying once several calls in a row have exhausted their retries"""
+    def __init__(self, threshold=5):
+        self.threshold = threshold
+        self.failures = 0
+
+    @property
+    def open(self):
+        return self.failures >= self.threshold
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+
+rate_limiter = RateLimiter()
+circuit_breaker = CircuitBreaker()
+
+def reset(max_requests_per_minute=None, burst=None):
+    """Start a run with a full token bucket and a closed circuit breaker.
+
+    Failures from an earlier run in the same process no longer count, and
+    the limits default to DOME_JUDGE_RPM and DOME_JUDGE_BURST.
+    """
+    global rate_limiter, circuit_breaker
+    rate_limiter = RateLimiter(max_requests_per_minute or JUDGE_RPM, burst or JUDGE_BURST)
+    circuit_breaker = CircuitBreaker()
+
+async def create_chat_completion(client: AsyncOpenAI, **kwargs):
+    """Call chat.completions.create under the rate limiter.
+
+    Retries are left to the SDK (the client's max_retries), which backs off
+    exponentially with jitter and honours the server's Retry-After header
+    on 429s. The circuit breaker only counts calls that still failed after
+    those retries.
+    """
+    await rate_limiter.acquire()
+    if circuit_breaker.open:
+        # While the API keeps failing, make single attempts instead of piling up retries
+        client = client.with_options(max_retries=0)
+    try:
+        response = await client.chat.completions.create(**kwargs)
+    except TRANSIENT_ERRORS:
+        circuit_breaker.record_failure()
+        raise
+    circuit_breaker.record_success()
+    return response
@@ -0,0 +1,49 @@
+import orjson
+from typing import Tuple
+
+# Structured output schema for a judge verdict; strict mode guarantees the
+# reply parses, so the verdict never depends on free-text matching
+VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "correctness": {"type": "boolean"},
+        "reason": {"type": "string"}
+    },
+    "required": ["correctness", "reason"],
+    "additionalProperties": False
+}
+
+# Output budget per verdict; the prompts ask for a one-sentence reason, which
+# keeps generation (the bulk of a judge call's latency) short
+VERDICT_MAX_TOKENS = 150
+
+VERDICT_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "verdict", "schema": VERDICT_SCHEMA, "strict": True}
+}
+
+def batch_verdict_format(number_field: str) -> dict:
+    """Response format for a list of verdicts, each tagged with its item number"""
+    item = {
+        **VERDICT_SCHEMA,
+        "properties": {number_field: {"type": "integer"}, **VERDICT_SCHEMA["properties"]},
+        "required": [number_field, *VERDICT_SCHEMA["required"]]
+    }
+    schema = {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": item}},
+        "required": ["results"],
+        "additionalProperties": False
+    }
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "verdicts", "schema": schema, "strict": True}
+    }
+
+def parse_verdict(output: str) -> Tuple[bool, str]:
+    """Read (correctness, reason) from a structured judge reply; raises ValueError if malformed"""
+    try:
+        verdict = orjson.loads(output)
+        return verdict["correctness"] is True, verdict["reason"]
+    except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+        raise ValueError(f"unreadable verdict: {output!r}") from e
@@ -1,6 +1,7 @@
 from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 @dataclass
@@ -55,6 +56,29 @@ class BaseModel(ABC):
         """
         pass
     
+    def parse_tasks(
+        self,
+        tasks: List[Dict[str, Any]],
+        page_htmls: List[str] = None,
+        max_workers: int = 8
+    ) -> List[Optional[WebInteraction]]:
+        """Parse several tasks concurrently, in the order given.
+        
+        Each call still waits on the model's request pool, so the pool's rate
+        limit, not max_workers, bounds the request rate.
+        
+        Args:
+            tasks: Task definitions from dom_tasks.jsonl
+            page_htmls: Current page HTML for each task, if available
+            max_workers: Maximum number of requests in flight
+            
+        Returns:
+            One WebInteraction (or None if parsing failed) per task
+        """
+        page_htmls = page_htmls or [None] * len(tasks)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(self.parse_task, tasks, page_htmls))
+    
     @abstractmethod
     def handle_error(self, task: Dict[str, Any], error: str) -> WebInteraction:
         """Handle errors during task execution and optionally retry.
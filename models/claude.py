@@ -1,60 +1,51 @@
-import json
+import re
 import time
+import orjson
+import hashlib
 import os
 import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Optional
-from anthropic import Anthropic
+from typing import Dict, Any, List, Optional
+from anthropic import (
+    Anthropic, APIConnectionError, DefaultHttpxClient, DEFAULT_CONNECTION_LIMITS, InternalServerError,
+    RateLimitError, Timeout
+)
 from .base import BaseModel, WebInteraction, TaskResult
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+from lxml.etree import ParserError
 
-class RequestPool:
-    def __init__(self, max_requests_per_minute=5):  # Claude has lower rate limits
-        self.requests = []
-        self.max_requests = max_requests_per_minute
-        self.window = 60  # 1 minute window
-        self.min_wait = 12  # Minimum 12 seconds between requests (5 per minute)
-
-    def can_make_request(self):
-        now = time.time()
-        # Remove old requests
-        self.requests = [t for t in self.requests if now - t < self.window]
-        
-        # Check if we've made any requests in the last min_wait seconds
-        if self.requests and (now - self.requests[-1]) < self.min_wait:
-            return False
-            
-        return len(self.requests) < self.max_requests
+# Elements and attributes kept in the page HTML sent to Claude
+ALLOWED_ELEMENTS = frozenset({
+    'div', 'span', 'p', 'a', 'button', 'input', 'select', 'option',
+    'form', 'label', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'nav',
+    'header', 'footer', 'main', 'section', 'article', 'aside',
+    'ul', 'ol', 'li', 'table', 'tr', 'td', 'th', 'thead', 'tbody',
+    'dialog', 'details', 'summary'
+})
+ALLOWED_ATTRIBUTES = {
+    'a': frozenset({'href', 'title'}),
+    'img': frozenset({'alt', 'src'}),
+}
+GLOBAL_ATTRIBUTES = frozenset({'id', 'class'})  # Allowed on any element
 
-    def add_request(self):
-        self.requests.append(time.time())
+HTML_CACHE_SIZE = 128  # Cleaned pages kept, since tasks often share a page
+RESPONSE_CACHE_SIZE = 1024  # Completions kept for replaying identical requests
 
-class ClaudeModel(BaseModel):
-    """Claude model implementation for the DOM benchmark."""
-    
-    def __init__(self, api_key: str = None, model_config: Dict[str, Any] = None):
-        """Initialize ClaudeModel with Anthropic API key"""
-        super().__init__("claude-3-5-haiku-20241022", model_config or {})
-        self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
-        if not self.api_key:
-            raise ValueError("Anthropic API key not provided")
-            
-        self.client = Anthropic(api_key=self.api_key)
-        self.temperature = 0
-        self.request_pool = RequestPool()  # Add request pooling
-        self.model = "claude-3-5-haiku-20241022"  # Set the specific model name
-        
-        # Setup logging for skipped tasks
-        self.output_dir = Path("results/skipped_tasks")
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.skipped_logger = logging.getLogger('skipped_tasks')
-        handler = logging.FileHandler(self.output_dir / 'skipped_tasks.log')
-        handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-        self.skipped_logger.addHandler(handler)
-        self.skipped_logger.setLevel(logging.INFO)
-        
-        # Default system prompt
-        self.system_prompt = """You are an AI assistant that helps users interact with web elements.
+# Page HTML sent with a task: subtrees around elements mentioning the task's
+# words, up to PAGE_HTML_MAX_CHARS; the start of the page if nothing matches
+PAGE_HTML_MAX_CHARS = 6000
+PAGE_HTML_FALLBACK_CHARS = 8000
+TASK_WORD_PATTERN = re.compile(r"\w{3,}")
+TASK_STOP_WORDS = frozenset({
+    'the', 'and', 'for', 'with', 'from', 'into', 'that', 'this', 'then', 'its', 'your',
+    'click', 'type', 'hover', 'enter', 'press', 'select', 'page'
+})
+
+# Default system prompt
+SYSTEM_PROMPT = """You are an AI assistant that helps users interact with web elements.
 Your task is to understand the user's intent and generate precise web element interactions.
 
 IMPORTANT: You MUST respond with ONLY a valid JSON object. No other text, explanations, or formatting.
@@ -79,89 +70,352 @@ Example valid response:
     "selector_value": "#submit-button",
     "input_text": null
 }"""
+
+# Interactions are returned through a forced tool call, so the reply is always
+# an object matching the schema instead of free text to be parsed
+INTERACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["click", "type", "hover"]},
+        "selector_type": {"type": "string", "enum": ["css", "xpath", "id", "class"]},
+        "selector_value": {"type": "string"},
+        "input_text": {"type": ["string", "null"]}
+    },
+    "required": ["action", "selector_type", "selector_value"]
+}
+INTERACTION_TOOL = {
+    "name": "emit_interaction",
+    "description": "Report the web interaction that performs the task.",
+    "input_schema": INTERACTION_SCHEMA
+}
+# One connection pool shared by every ClaudeModel: over HTTP/2 the parallel
+# workers multiplex a kept-alive connection instead of each paying for a new
+# TCP and TLS handshake
+CONNECTION_LIMITS = type(DEFAULT_CONNECTION_LIMITS)(
+    max_connections=16,
+    max_keepalive_connections=16,
+    keepalive_expiry=60.0
+)
+HTTP_CLIENT = DefaultHttpxClient(http2=True, limits=CONNECTION_LIMITS)
+REQUEST_TIMEOUT = Timeout(60, connect=5)
+
+class RequestPool:
+    """Token bucket: requests are admitted at a steady rate instead of in bursts at the window edge"""
+    def __init__(self, max_requests_per_minute=5):  # Claude has lower rate limits
+        self.capacity = max_requests_per_minute
+        self.rate = max_requests_per_minute / 60  # tokens per second
+        self.tokens = float(self.capacity)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()  # parallel runners share one model across threads
+
+    def acquire(self) -> float:
+        """Take a token if one is available; return 0, or the seconds to wait before trying again"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+class ClaudeModel(BaseModel):
+    """Claude model implementation for the DOM benchmark."""
+    
+    def __init__(self, api_key: str = None, model_config: Dict[str, Any] = None):
+        """Initialize ClaudeModel with Anthropic API key"""
+        super().__init__("claude-3-5-haiku-20241022", model_config or {})
+        self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+        if not self.api_key:
+            raise ValueError("Anthropic API key not provided")
+            
+        # Retries happen in _create_message, behind the request pool, rather than in the SDK
+        self.client = Anthropic(
+            api_key=self.api_key, http_client=HTTP_CLIENT, timeout=REQUEST_TIMEOUT, max_retries=0
+        )
+        self.temperature = 0
+        self.request_pool = RequestPool()  # Add request pooling
+        self.max_retries = 5  # Failed requests are re-queued this many times
+        self._cache = OrderedDict()  # Completion text by request hash, least recently used first
+        self._cache_lock = threading.Lock()
+        self._html_cache = OrderedDict()  # Cleaned HTML by page hash, least recently used first
+        self._html_cache_lock = threading.Lock()
+        self.model = "claude-3-5-haiku-20241022"  # Set the specific model name
         
-    def _clean_html(self, html: str) -> str:
-        """Keep only relevant semantic HTML elements and attributes for content analysis."""
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Define elements we want to keep
-        allowed_elements = {
-            'div', 'span', 'p', 'a', 'button', 'input', 'select', 'option',
-            'form', 'label', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'nav',
-            'header', 'footer', 'main', 'section', 'article', 'aside',
-            'ul', 'ol', 'li', 'table', 'tr', 'td', 'th', 'thead', 'tbody',
-            'dialog', 'details', 'summary'
-        }
+        # Setup logging for skipped tasks
+        self.output_dir = Path("results/skipped_tasks")
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.skipped_logger = logging.getLogger('skipped_tasks')
+        if not self.skipped_logger.handlers:  # The logger outlives the model; attach its file once
+            handler = logging.FileHandler(self.output_dir / 'skipped_tasks.log')
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            self.skipped_logger.addHandler(handler)
+        self.skipped_logger.setLevel(logging.INFO)
+        self.skipped_logger.propagate = False
         
-        # Define attributes we want to keep
-        allowed_attributes = {
-            'a': ['href', 'title'],
-            'img': ['alt', 'src'],
-            '*': ['id', 'class']  # Allow these on any element
-        }
+        # Default system prompt
+        self.system_prompt = SYSTEM_PROMPT
         
-        # Function to clean a tag
-        def clean_tag(tag):
-            if tag.name not in allowed_elements:
-                tag.unwrap()  # Keep content but remove the tag
-                return
+    def _cached(self, key: bytes) -> Optional[str]:
+        """Cached completion text of a request, if any."""
+        with self._cache_lock:
+            text = self._cache.get(key)
+            if text is not None:
+                self._cache.move_to_end(key)
+            return text
+
+    def _remember(self, key: bytes, text: str):
+        """Store a completion, dropping the least recently used beyond RESPONSE_CACHE_SIZE."""
+        with self._cache_lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            if len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def _clean_html(self, html: str) -> str:
+        """Keep only relevant semantic HTML elements and attributes for content analysis."""
+        key = hashlib.blake2b(html.encode(), digest_size=16).digest()
+        with self._html_cache_lock:
+            cleaned = self._html_cache.get(key)
+            if cleaned is not None:
+                self._html_cache.move_to_end(key)
+                return cleaned
+                
+        cleaned = self._strip_html(html)
+        with self._html_cache_lock:
+            self._html_cache[key] = cleaned
+            if len(self._html_cache) > HTML_CACHE_SIZE:
+                self._html_cache.popitem(last=False)
+        return cleaned
+
+    def _strip_html(self, html: str) -> str:
+        """Drop disallowed elements (keeping their content) and attributes."""
+        try:
+            root = lxml.html.document_fromstring(html)
+        except ParserError:
+            return ""  # Blank page
+            
+        # Single pass over the tree; the list is taken first since dropping
+        # tags moves their children up
+        for el in list(root.iter(etree.Element))[1:]:
+            if el.tag not in ALLOWED_ELEMENTS:
+                el.drop_tag()  # Keep content but remove the tag
+                continue
                 
             # Remove all attributes except allowed ones
-            allowed_for_tag = allowed_attributes.get(tag.name, []) + allowed_attributes['*']
-            attrs = dict(tag.attrs)  # Create a copy since we're modifying
-            for attr in attrs:
+            allowed_for_tag = ALLOWED_ATTRIBUTES.get(el.tag, frozenset()) | GLOBAL_ATTRIBUTES
+            for attr in list(el.attrib):
                 if attr not in allowed_for_tag:
-                    del tag[attr]
+                    del el.attrib[attr]
         
-        # Clean all tags in the document
-        for tag in soup.find_all(True):
-            clean_tag(tag)
+        # The <html> root is never an allowed element, so only its contents are kept
+        return (root.text or "") + "".join(etree.tostring(child, encoding="unicode") for child in root)
+
+    def _relevant_html(self, html: str, task_text: str) -> str:
+        """Cut cleaned page HTML down to the parts likely to hold the task's target element."""
+        if len(html) <= PAGE_HTML_MAX_CHARS:
+            return html
             
-        return str(soup)
+        words = set(TASK_WORD_PATTERN.findall(task_text.lower())) - TASK_STOP_WORDS
+        try:
+            root = lxml.html.document_fromstring(html)
+        except ParserError:
+            return html[:PAGE_HTML_FALLBACK_CHARS]
+        if not words:
+            return html[:PAGE_HTML_FALLBACK_CHARS]
+            
+        # Each element whose text or attributes mention a task word, taken
+        # with its parent and grandparent for context
+        pattern = re.compile("|".join(map(re.escape, sorted(words))), re.IGNORECASE)
+        subtrees = []
+        for el in root.iter(etree.Element):
+            if not any(pattern.search(value) for value in [el.text or "", *el.attrib.values()]):
+                continue
+            subtree = el
+            for _ in range(2):
+                parent = subtree.getparent()
+                if parent is None or parent.tag in ('html', 'body'):
+                    break
+                subtree = parent
+            subtrees.append(subtree)
+            
+        # Skip subtrees already contained in another one
+        selected = set(subtrees)
+        parts, total = [], 0
+        for subtree in dict.fromkeys(subtrees):
+            if any(ancestor in selected for ancestor in subtree.iterancestors()):
+                continue
+            part = etree.tostring(subtree, encoding="unicode", with_tail=False)
+            parts.append(part[:PAGE_HTML_MAX_CHARS - total])
+            total += len(parts[-1]) + 1  # With the joining newline
+            if total >= PAGE_HTML_MAX_CHARS:
+                break
+        return "\n".join(parts) if parts else html[:PAGE_HTML_FALLBACK_CHARS]
 
-    def parse_task(self, task: Dict[str, Any], page_html: str = None) -> Optional[WebInteraction]:
-        """Parse task using Claude to understand the interaction."""
-        # Clean HTML if provided
+    def _create_message(self, **kwargs):
+        """Send one request through the request pool, re-queueing it when rate limited or overloaded."""
+        for attempt in range(self.max_retries + 1):
+            while (wait := self.request_pool.acquire()) > 0:
+                time.sleep(wait)
+            try:
+                return self.client.messages.create(**kwargs)
+            except (RateLimitError, InternalServerError, APIConnectionError) as e:
+                if attempt == self.max_retries:
+                    raise
+                try:
+                    wait = float(e.response.headers["retry-after"])
+                except (AttributeError, KeyError, ValueError):
+                    wait = min(2 ** attempt, 60)
+                logging.warning(f"Claude request failed ({type(e).__name__}), retrying in {wait:.0f}s")
+                time.sleep(wait)
+
+    def _reply_text(self, message) -> str:
+        """A reply's tool call input as JSON, or its text if it made no tool call."""
+        for block in message.content:
+            if block.type == "tool_use":
+                return orjson.dumps(block.input).decode()
+        return message.content[0].text
+
+    def _request_key(
+        self, model: str, max_tokens: int, temperature: float, system_prompt: str, messages: list, tool: dict = None
+    ) -> bytes:
+        """Response cache key of a request."""
+        return hashlib.blake2b(
+            orjson.dumps([model, max_tokens, temperature, system_prompt, tool and tool["name"], messages]),
+            digest_size=16
+        ).digest()
+
+    def _complete(
+        self,
+        messages: list,
+        model: str = None,
+        max_tokens: int = 1024,
+        temperature: float = None,
+        tool: dict = None
+    ) -> str:
+        """Text of a completion; identical requests are answered from the response cache.
+        
+        With a tool, Claude is made to call it and the call's input is returned as JSON.
+        """
+        model = model or self.model
+        temperature = self.temperature if temperature is None else temperature
+        key = self._request_key(model, max_tokens, temperature, self.system_prompt, messages, tool)
+        if (text := self._cached(key)) is not None:
+            return text
+        
+        request = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "system": self.system_prompt,
+            "messages": messages
+        }
+        if tool:
+            request["tools"] = [tool]
+            request["tool_choice"] = {"type": "tool", "name": tool["name"]}
+        response = self._create_message(**request)
+        text = self._reply_text(response)
+        # A reply cut off by max_tokens is not worth replaying
+        if response.stop_reason != "max_tokens":
+            self._remember(key, text)
+        return text
+
+    def _task_messages(self, task: Dict[str, Any], page_html: str = None) -> list:
+        """Messages asking for the interaction of one task."""
+        # Clean HTML if provided, keeping the parts relevant to the task
         if page_html:
-            page_html = self._clean_html(page_html)
+            page_html = self._relevant_html(self._clean_html(page_html), task['task'])
             
         # Construct prompt
         user_prompt = f"""Task: {task['task']}
 Current Page HTML: {page_html if page_html else 'Not available'}
 
 Based on the task description and current page HTML, generate a web interaction as a JSON object."""
+        return [{"role": "user", "content": user_prompt}]
 
+    def _interaction(self, text: str, task: Dict[str, Any]) -> WebInteraction:
+        """Build the WebInteraction from Claude's JSON reply."""
+        text = text.strip()
+        if not text.startswith('{'):
+            raise ValueError(f"Reply is not a JSON object: {text[:100]!r}")
+        interaction_data = orjson.loads(text)
+        return WebInteraction(
+            action=interaction_data.get('action', 'click'),
+            selector_type=interaction_data.get('selector_type', 'css'),
+            selector_value=interaction_data.get('selector_value'),
+            input_text=interaction_data.get('input_text'),
+            description=task['task']
+        )
+
+    def parse_task(self, task: Dict[str, Any], page_html: str = None) -> Optional[WebInteraction]:
+        """Parse task using Claude to understand the interaction."""
         try:
-            # Wait for rate limit if needed
-            while not self.request_pool.can_make_request():
-                time.sleep(1)
-            self.request_pool.add_request()
-            
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                temperature=self.temperature,
-                system=self.system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
+            text = self._complete(self._task_messages(task, page_html), tool=INTERACTION_TOOL)
             
             # Extract and parse the JSON response
-            interaction_data = json.loads(response.content)
-            return WebInteraction(
-                action=interaction_data.get('action', 'click'),
-                selector_type=interaction_data.get('selector_type', 'css'),
-                selector_value=interaction_data.get('selector_value'),
-                input_text=interaction_data.get('input_text'),
-                description=task['task']
-            )
+            return self._interaction(text, task)
         except Exception as e:
             print(f"Error in Claude task parsing: {str(e)}")
             return None
 
+    def submit_batch(self, tasks: List[Dict[str, Any]], max_poll_interval: float = 60) -> List[Optional[WebInteraction]]:
+        """Parse tasks through the Message Batches API and wait for the results.
+        
+        Batches run on their own rate limits at half the price, but may take
+        minutes to hours. The replies are stored in the response cache, so
+        later parse_task calls for the same tasks (without page HTML) return
+        them without a request, for up to RESPONSE_CACHE_SIZE tasks.
+        """
+        params = [
+            {
+                "model": self.model,
+                "max_tokens": 1024,
+                "temperature": self.temperature,
+                "system": self.system_prompt,
+                "messages": self._task_messages(task),
+                "tools": [INTERACTION_TOOL],
+                "tool_choice": {"type": "tool", "name": INTERACTION_TOOL["name"]}
+            }
+            for task in tasks
+        ]
+        batch = self.client.messages.batches.create(
+            requests=[{"custom_id": str(i), "params": p} for i, p in enumerate(params)]
+        )
+        print(f"Submitted Claude batch {batch.id} with {len(tasks)} tasks")
+        
+        # Poll with exponential backoff until every request has been processed
+        interval = 5
+        while batch.processing_status != "ended":
+            time.sleep(interval)
+            interval = min(interval * 2, max_poll_interval)
+            batch = self.client.messages.batches.retrieve(batch.id)
+            
+        interactions = [None] * len(tasks)
+        for entry in self.client.messages.batches.results(batch.id):
+            i = int(entry.custom_id)
+            if entry.result.type != "succeeded":
+                print(f"Claude batch request for task {tasks[i].get('id')} {entry.result.type}")
+                continue
+                
+            message = entry.result.message
+            text = self._reply_text(message)
+            if message.stop_reason != "max_tokens":
+                key = self._request_key(
+                    self.model, 1024, self.temperature, self.system_prompt, params[i]["messages"], INTERACTION_TOOL
+                )
+                self._remember(key, text)
+            try:
+                interactions[i] = self._interaction(text, tasks[i])
+            except Exception as e:
+                print(f"Error in Claude task parsing: {str(e)}")
+        return interactions
+
     def handle_error(self, task: Dict[str, Any], error: str) -> Optional[WebInteraction]:
-        """Use Claude to understand and handle errors."""
+        """Use Claude to understand and handle errors.
+        
+        The reply is a forced tool call, so Claude always suggests a new
+        interaction; it returns None only when the request fails.
+        """
         error_prompt = f"""Task: {task['task']}
 Error: {error}
 
@@ -169,24 +423,9 @@ Based on the task and error message, suggest a new web interaction that might wo
 Respond with a JSON object following the same schema as before."""
 
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                temperature=self.temperature,
-                system=self.system_prompt,
-                messages=[
-                    {"role": "user", "content": error_prompt}
-                ]
-            )
+            text = self._complete([{"role": "user", "content": error_prompt}], tool=INTERACTION_TOOL)
             
-            interaction_data = json.loads(response.content)
-            return WebInteraction(
-                action=interaction_data.get('action', 'click'),
-                selector_type=interaction_data.get('selector_type', 'css'),
-                selector_value=interaction_data.get('selector_value'),
-                input_text=interaction_data.get('input_text'),
-                description=task['task']
-            )
+            return self._interaction(text, task)
         except Exception as e:
             print(f"Error in Claude error handling: {str(e)}")
             return None
@@ -208,14 +447,11 @@ Analyze if the interaction was successful. Consider:
 
 Respond with exactly 'YES' or 'NO'."""
 
-        response = self.client.messages.create(
+        text = self._complete(
+            [{"role": "user", "content": prompt}],
             model="claude-3-opus-20240229",
             max_tokens=10,
-            temperature=0,
-            system=self.system_prompt,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+            temperature=0
         )
         
-        return response.content[0].text.strip() == "YES"
+        return text.strip() == "YES"
@@ -1,14 +1,100 @@
-import json
 import time
+import orjson
+import hashlib
 import re
+import random
 import logging
+import threading
+from collections import OrderedDict
 import tiktoken
 from pathlib import Path
 from typing import Dict, Any, Optional, Tuple
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from bs4 import BeautifulSoup
 from .base import BaseModel, WebInteraction, TaskResult
-from .gemini_function_parser import FunctionParser
+
+RESPONSE_CACHE_SIZE = 1024  # Responses kept for replaying identical requests
+
+# Regex cleanup applied after BeautifulSoup, compiled once at import
+HTML_CLEANUP_PATTERNS = [
+    # Remove noscript tags and their contents
+    re.compile(r'<noscript\b[^<]*(?:(?!<\/noscript>)<[^<]*)*<\/noscript>'),
+    # Remove template tags (often used by JS frameworks)
+    re.compile(r'<template\b[^<]*(?:(?!<\/template>)<[^<]*)*<\/template>'),
+    # Remove preloaded resources
+    re.compile(r'<link[^>]*rel="preload"[^>]*>'),
+    # Remove meta tags with CSS/JS content
+    re.compile(r'<meta[^>]*http-equiv="Content-Style-Type"[^>]*>'),
+    re.compile(r'<meta[^>]*http-equiv="Content-Script-Type"[^>]*>'),
+    # Remove inline event handlers
+    re.compile(r'\son\w+="[^"]*"'),
+    # Remove javascript: URLs
+    re.compile(r'href="javascript:[^"]*"'),
+    # Remove data attributes (often used for JS functionality)
+    re.compile(r'\sdata-[a-zA-Z0-9\-_]+="[^"]*"'),
+    # Remove framework-specific attributes
+    re.compile(r'\s(?:ng|v|x)-[a-zA-Z0-9\-_]+="[^"]*"'),
+    # Remove old-style HTML styling attributes
+    re.compile(r'\s(?:align|bgcolor|border|cellpadding|cellspacing|color|face|height|hspace|'
+               r'marginheight|marginwidth|size|valign|vspace|width)="[^"]*"'),
+]
+
+# Enhanced system prompt for function-like output
+SYSTEM_PROMPT = """You are an AI assistant that helps users interact with web elements.
+Your task is to understand the user's intent and generate precise web element interactions.
+
+For each task, analyze:
+1. The user's goal and required interaction (click, type, hover)
+2. The target element's properties and accessibility
+3. Any constraints or special conditions
+
+Generate your response as a JSON object in the following format:
+{
+    "action": "click|type|hover",
+    "selector_type": "css|xpath|id|class",
+    "selector_value": "string",
+    "input_text": "string",  # For type actions
+    "description": "string"  # Optional description of the interaction
+}"""
+
+# Schema for JSON mode, so an interaction reply always parses
+INTERACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["click", "type", "hover"]},
+        "selector_type": {"type": "string", "enum": ["css", "xpath", "id", "class"]},
+        "selector_value": {"type": "string"},
+        "input_text": {"type": "string", "nullable": True},
+        "description": {"type": "string", "nullable": True}
+    },
+    "required": ["action", "selector_type", "selector_value"]
+}
+
+def _target(task: Dict[str, Any]) -> Tuple[str, str]:
+    """Selector type and value of the task's target element"""
+    target = task['target_element']
+    return target['type'], target['value']
+
+class RequestPool:
+    """Token bucket shared by the threads of a parallel run"""
+    def __init__(self, max_requests_per_minute=60):
+        self.capacity = max_requests_per_minute
+        self.rate = max_requests_per_minute / 60  # tokens per second
+        self.tokens = float(self.capacity)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token if one is available; return 0, or the seconds to wait before trying again"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
 
 class GeminiModel(BaseModel):
     """Gemini model implementation for the DOM benchmark."""
@@ -20,52 +106,30 @@ class GeminiModel(BaseModel):
         self.max_retries = 10
         self.temperature = model_config.get("temperature", 0)
         self.max_tokens = 32000
+        self.request_pool = RequestPool(self.model_config.get("requests_per_minute", 60))
+        self._cache = OrderedDict()  # Response text by request hash, least recently used first
+        self._cache_lock = threading.Lock()
         # Use GPT-4 tokenizer as an approximation since Gemini uses similar tokenization
         self.tokenizer = tiktoken.encoding_for_model("gpt-4")
-        self.function_parser = FunctionParser()
         
         # Setup logging for skipped tasks
         self.output_dir = Path("results/skipped_tasks")
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.skipped_logger = logging.getLogger('skipped_tasks_gemini')
-        handler = logging.FileHandler(self.output_dir / 'skipped_tasks_gemini.log')
-        handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-        self.skipped_logger.addHandler(handler)
+        if not self.skipped_logger.handlers:  # The logger outlives the model; attach its file once
+            handler = logging.FileHandler(self.output_dir / 'skipped_tasks_gemini.log')
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            self.skipped_logger.addHandler(handler)
         self.skipped_logger.setLevel(logging.INFO)
+        self.skipped_logger.propagate = False
         
         # Enhanced system prompt for function-like output
-        self.system_prompt = """You are an AI assistant that helps users interact with web elements.
-Your task is to understand the user's intent and generate precise web element interactions.
-
-For each task, analyze:
-1. The user's goal and required interaction (click, type, hover)
-2. The target element's properties and accessibility
-3. Any constraints or special conditions
-
-Generate your response in the following format:
-<interaction>
-{
-    "action": "click|type|hover",
-    "selector_type": "css|xpath|id|class",
-    "selector_value": "string",
-    "input_text": "string",  # For type actions
-    "description": "string"  # Optional description of the interaction
-}
-</interaction>
-
-If you need to perform additional actions, use the following format:
-<tool>function_name</tool>
-<args>
-{
-    "argument1": "value1",
-    "argument2": "value2"
-}
-</args>"""
+        self.system_prompt = SYSTEM_PROMPT
 
     def _clean_html(self, html: str) -> str:
         """Remove all JavaScript and CSS from HTML to reduce size."""
         # First use BeautifulSoup for robust HTML parsing
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(html, "lxml")
         
         # Remove script tags and their contents
         for script in soup.find_all('script'):
@@ -88,82 +152,85 @@ If you need to perform additional actions, use the following format:
         cleaned_html = str(soup)
         
         # Additional regex-based cleaning for things BeautifulSoup might miss
-        # Remove noscript tags and their contents
-        cleaned_html = re.sub(r'<noscript\b[^<]*(?:(?!<\/noscript>)<[^<]*)*<\/noscript>', '', cleaned_html)
-        
-        # Remove template tags (often used by JS frameworks)
-        cleaned_html = re.sub(r'<template\b[^<]*(?:(?!<\/template>)<[^<]*)*<\/template>', '', cleaned_html)
-        
-        # Remove preloaded resources
-        cleaned_html = re.sub(r'<link[^>]*rel="preload"[^>]*>', '', cleaned_html)
-        
-        # Remove meta tags with CSS/JS content
-        cleaned_html = re.sub(r'<meta[^>]*http-equiv="Content-Style-Type"[^>]*>', '', cleaned_html)
-        cleaned_html = re.sub(r'<meta[^>]*http-equiv="Content-Script-Type"[^>]*>', '', cleaned_html)
-        
-        # Remove inline event handlers
-        cleaned_html = re.sub(r'\son\w+="[^"]*"', '', cleaned_html)
-        
-        # Remove javascript: URLs
-        cleaned_html = re.sub(r'href="javascript:[^"]*"', '', cleaned_html)
-        
-        # Remove data attributes (often used for JS functionality)
-        cleaned_html = re.sub(r'\sdata-[a-zA-Z0-9\-_]+="[^"]*"', '', cleaned_html)
-        
-        # Remove framework-specific attributes
-        cleaned_html = re.sub(r'\s(?:ng|v|x)-[a-zA-Z0-9\-_]+="[^"]*"', '', cleaned_html)
-        
-        # Remove old-style HTML styling attributes
-        attrs_to_remove = ['align', 'bgcolor', 'border', 'cellpadding', 'cellspacing', 
-                          'color', 'face', 'height', 'hspace', 'marginheight', 'marginwidth',
-                          'size', 'valign', 'vspace', 'width']
-        for attr in attrs_to_remove:
-            cleaned_html = re.sub(fr'\s{attr}="[^"]*"', '', cleaned_html)
+        for pattern in HTML_CLEANUP_PATTERNS:
+            cleaned_html = pattern.sub('', cleaned_html)
         
         return cleaned_html
 
-    def _call_api(self, messages: list, retry_count: int = 0) -> Tuple[Optional[dict], bool]:
-        """Helper method to call Gemini API with retry logic."""
-        try:
-            # Convert messages to Gemini format
-            prompt = ""
-            for msg in messages:
-                role_prefix = "System: " if msg["role"] == "system" else "User: " if msg["role"] == "user" else "Assistant: "
-                prompt += f"{role_prefix}{msg['content']}\n\n"
+    def _call_api(self, messages: list, response_schema: dict = None) -> Tuple[Optional[dict], bool]:
+        """Helper method to call Gemini API with retry logic; with a response_schema the reply is JSON."""
+        # Convert messages to Gemini format
+        prompt = ""
+        for msg in messages:
+            role_prefix = "System: " if msg["role"] == "system" else "User: " if msg["role"] == "user" else "Assistant: "
+            prompt += f"{role_prefix}{msg['content']}\n\n"
 
-            # Add explicit instruction for JSON output
-            prompt += "\nPlease respond with a valid JSON object following the specified format."
+        # Add explicit instruction for JSON output
+        prompt += "\nPlease respond with a valid JSON object following the specified format."
+        
+        json_mode = {"response_mime_type": "application/json", "response_schema": response_schema} if response_schema else {}
+        generation_config = genai.types.GenerationConfig(
+            temperature=self.temperature,
+            max_output_tokens=self.max_tokens,
+            **json_mode
+        )
 
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=self.temperature,
-                    max_output_tokens=self.max_tokens
-                )
-            )
-            
-            # Ensure the response was generated successfully
-            if not response.parts:
-                raise Exception("Empty response from Gemini")
+        for retry_count in range(self.max_retries + 1):
+            try:
+                while (wait := self.request_pool.acquire()) > 0:
+                    time.sleep(wait)
                 
-            return response, False
-        except Exception as e:
-            if any(err in str(e).lower() for err in ["too_long", "length", "token limit"]):
-                # Count tokens in the messages
-                total_tokens = len(self.tokenizer.encode(prompt))
-                self.skipped_logger.info(
-                    f"Context length exceeded - Token count: {total_tokens} (limit: 2000000), "
-                    f"Error: {str(e)}"
-                )
-            
-            if retry_count >= self.max_retries:
-                print(f"Max retries ({self.max_retries}) exceeded. Error: {str(e)}")
-                return None, True
+                response = self.model.generate_content(prompt, generation_config=generation_config)
+                
+                # Ensure the response was generated successfully
+                if not response.parts:
+                    raise Exception("Empty response from Gemini")
+                    
+                return response, False
+            except Exception as e:
+                if any(err in str(e).lower() for err in ["too_long", "length", "token limit"]):
+                    # Count tokens in the messages
+                    total_tokens = len(self.tokenizer.encode(prompt))
+                    self.skipped_logger.info(
+                        f"Context length exceeded - Token count: {total_tokens} (limit: 2000000), "
+                        f"Error: {str(e)}"
+                    )
                 
-            wait_time = min(2 ** retry_count, 8)
-            print(f"API call failed, retrying in {wait_time}s. Error: {str(e)}")
-            time.sleep(wait_time)
-            return self._call_api(messages, retry_count + 1)
+                # A rejected request fails the same way every time
+                if isinstance(e, google_exceptions.InvalidArgument):
+                    print(f"Request rejected, not retrying. Error: {str(e)}")
+                    return None, True
+                    
+                if retry_count >= self.max_retries:
+                    print(f"Max retries ({self.max_retries}) exceeded. Error: {str(e)}")
+                    return None, True
+                    
+                # Full jitter, so parallel workers that failed together do not retry together
+                wait_time = random.uniform(0, min(2 ** retry_count, 8))
+                reason = "Rate limited" if isinstance(e, google_exceptions.ResourceExhausted) else "API call failed"
+                print(f"{reason}, retrying in {wait_time:.1f}s. Error: {str(e)}")
+                time.sleep(wait_time)
+
+    def _complete(self, messages: list, response_schema: dict = None) -> Optional[str]:
+        """Response text for the messages, or None on API errors; identical requests are answered from the cache."""
+        key = hashlib.blake2b(
+            orjson.dumps([self.model_name, self.temperature, response_schema, messages]),
+            digest_size=16
+        ).digest()
+        with self._cache_lock:
+            text = self._cache.get(key)
+            if text is not None:
+                self._cache.move_to_end(key)
+                return text
+        
+        response, error = self._call_api(messages, response_schema)
+        if error or not response:
+            return None
+        with self._cache_lock:
+            self._cache[key] = response.text
+            if len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return response.text
 
     def parse_task(self, task: Dict[str, Any], page_html: str = None) -> Optional[WebInteraction]:
         """Parse task using Gemini to understand the interaction."""
@@ -192,20 +259,19 @@ Based on the task description and current page HTML:
             )
             return None  # Skip the task instead of using ground truth
             
-        response, error = self._call_api(messages)
-        if error or not response:
+        text = self._complete(messages, INTERACTION_SCHEMA)
+        if text is None:
             return None  # Skip on API errors instead of using ground truth
             
         try:
-            # Parse the response text to extract interaction details
-            interaction_data = self.function_parser.extract_web_interaction(response.text)
-            if not interaction_data:
-                raise ValueError("No valid interaction found in response")
+            # JSON mode replies with the interaction object itself
+            interaction_data = orjson.loads(text)
             
+            selector_type, selector_value = _target(task)
             return WebInteraction(
                 action=interaction_data.get('action', task.get('interaction', 'click')).lower(),
-                selector_type=interaction_data.get('selector_type', task['target_element']['type']).lower(),
-                selector_value=interaction_data.get('selector_value', task['target_element']['value']),
+                selector_type=interaction_data.get('selector_type', selector_type).lower(),
+                selector_value=interaction_data.get('selector_value', selector_value),
                 input_text=interaction_data.get('input_text', task.get('input_text')),
                 description=task.get('task')
             )
@@ -224,7 +290,7 @@ Based on the task description and current page HTML:
 
 Task: {task['task']}
 Original Error: {error}
-Previous Interaction: {json.dumps(task.get('previous_interaction', {}), indent=2)}
+Previous Interaction: {orjson.dumps(task.get('previous_interaction', {}), option=orjson.OPT_INDENT_2).decode()}
 
 Analyze the error and suggest a solution considering:
 1. Is this a timing/loading issue?
@@ -240,16 +306,16 @@ Generate a modified interaction as a JSON object or respond with "GIVE UP" if un
             {"role": "user", "content": prompt}
         ]
         
-        response, error = self._call_api(messages)
-        if error or not response:
+        text = self._complete(messages)
+        if text is None:
             return self.parse_task(task)
             
-        suggestion = response.text.strip()
+        suggestion = text.strip()
         if suggestion == "GIVE UP":
             return None
             
         try:
-            interaction_data = json.loads(suggestion)
+            interaction_data = orjson.loads(suggestion)
             
             return WebInteraction(
                 action=interaction_data['action'],
@@ -270,10 +336,10 @@ Generate a modified interaction as a JSON object or respond with "GIVE UP" if un
         prompt = f"""System: {self.system_prompt}
 
 Task: {task['task']}
-Target Element: {json.dumps(result.html_element, indent=2)}
+Target Element: {orjson.dumps(result.html_element, option=orjson.OPT_INDENT_2).decode()}
 Before State: {result.before_screenshot}
 After State: {result.after_screenshot}
-Validation Rules: {json.dumps(task.get('validation_rules', {}), indent=2)}
+Validation Rules: {orjson.dumps(task.get('validation_rules', {}), option=orjson.OPT_INDENT_2).decode()}
 
 Evaluate the interaction success based on:
 1. Element state changes (visibility, content, attributes)
@@ -291,11 +357,11 @@ Respond with:
             {"role": "user", "content": prompt}
         ]
         
-        response, error = self._call_api(messages)
-        if error or not response:
+        text = self._complete(messages)
+        if text is None:
             return False
             
-        validation_result = response.text.strip()
+        validation_result = text.strip()
         
         if validation_result.startswith("YES"):
             return True
@@ -4,27 +4,61 @@ import os
 import base64
 import logging
 import re
+import threading
 import tiktoken
+from collections import deque
 from pathlib import Path
 from typing import Dict, Any, Optional, Tuple
 from openai import OpenAI
 from bs4 import BeautifulSoup
 from .base import BaseModel, WebInteraction, TaskResult
 
+# Enhanced system prompt with hover support
+SYSTEM_PROMPT = """You are an AI assistant that helps users interact with web elements.
+Your task is to understand the user's intent and generate precise web element interactions.
+
+IMPORTANT: You MUST respond with ONLY a valid JSON object. No other text, explanations, or formatting.
+The JSON object MUST follow this exact schema:
+{
+    "action": "click" | "type" | "hover",
+    "selector_type": "css" | "xpath" | "id" | "class",
+    "selector_value": "string",
+    "input_text": "string"  // Only required for type actions
+}
+
+Guidelines for generating selectors:
+1. Prefer stable selectors (id, unique class names) over dynamic ones
+2. Consider element visibility and interactability
+3. Handle dynamic content and loading states
+4. Pay attention to timing and wait states
+
+Example valid response:
+{
+    "action": "click",
+    "selector_type": "css",
+    "selector_value": "#submit-button",
+    "input_text": null
+}"""
+
 class RequestPool:
+    """Sliding one-minute window of request timestamps"""
     def __init__(self, max_requests_per_minute=3500):
-        self.requests = []
+        self.requests = deque()
         self.max_requests = max_requests_per_minute
         self.window = 60  # 1 minute window
+        self.lock = threading.Lock()  # parallel runners share one model across threads
 
-    def can_make_request(self):
-        now = time.time()
-        # Remove old requests
-        self.requests = [t for t in self.requests if now - t < self.window]
-        return len(self.requests) < self.max_requests
-
-    def add_request(self):
-        self.requests.append(time.time())
+    def acquire(self) -> float:
+        """Admit a request if the window has room; return 0, or the seconds until a slot frees up"""
+        with self.lock:
+            now = time.monotonic()
+            # Drop requests that have left the window
+            while self.requests and now - self.requests[0] >= self.window:
+                self.requests.popleft()
+            if len(self.requests) < self.max_requests:
+                self.requests.append(now)
+                return 0.0
+            return self.window - (now - self.requests[0])
 
 class GPT4Model(BaseModel):
     """GPT-4 model implementation for the DOM benchmark."""
@@ -46,45 +80,20 @@ class GPT4Model(BaseModel):
         self.output_dir = Path("results/skipped_tasks")
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.skipped_logger = logging.getLogger('skipped_tasks')
-        handler = logging.FileHandler(self.output_dir / 'skipped_tasks.log')
-        handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-        self.skipped_logger.addHandler(handler)
+        if not self.skipped_logger.handlers:  # The logger outlives the model; attach its file once
+            handler = logging.FileHandler(self.output_dir / 'skipped_tasks.log')
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            self.skipped_logger.addHandler(handler)
         self.skipped_logger.setLevel(logging.INFO)
+        self.skipped_logger.propagate = False
         
         # Enhanced system prompt with hover support
-        self.system_prompt = """You are an AI assistant that helps users interact with web elements.
-Your task is to understand the user's intent and generate precise web element interactions.
-
-IMPORTANT: You MUST respond with ONLY a valid JSON object. No other text, explanations, or formatting.
-The JSON object MUST follow this exact schema:
-{
-    "action": "click" | "type" | "hover",
-    "selector_type": "css" | "xpath" | "id" | "class",
-    "selector_value": "string",
-    "input_text": "string"  // Only required for type actions
-}
-
-Guidelines for generating selectors:
-1. Prefer stable selectors (id, unique class names) over dynamic ones
-2. Consider element visibility and interactability
-3. Handle dynamic content and loading states
-4. Pay attention to timing and wait states
-
-Example valid response:
-{
-    "action": "click",
-    "selector_type": "css",
-    "selector_value": "#submit-button",
-    "input_text": null
-}"""
+        self.system_prompt = SYSTEM_PROMPT
 
     def _call_api(self, messages: list, retry_count: int = 0) -> Tuple[Optional[dict], bool]:
         """Helper method to call OpenAI API with retry logic."""
-        if not self.request_pool.can_make_request():
-            wait_time = 1
-            print(f"Rate limit exceeded, waiting {wait_time}s before retrying.")
-            time.sleep(wait_time)
-            return self._call_api(messages, retry_count)
+        while (wait := self.request_pool.acquire()) > 0:
+            time.sleep(wait)
         
         try:
             response = self.client.chat.completions.create(
@@ -92,7 +101,6 @@ Example valid response:
                 messages=messages,
                 temperature=self.temperature
             )
-            self.request_pool.add_request()
             return response, False
         except Exception as e:
             if retry_count >= self.max_retries:
@@ -117,7 +125,7 @@ Example valid response:
         print(f"[GPT-4] Initial HTML context length: {initial_tokens} tokens")
         
         # Use BeautifulSoup for robust HTML parsing
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(html, "lxml")
         
         # Define elements we want to keep
         allowed_elements = {
@@ -188,9 +196,8 @@ Based on the task description and current page HTML, generate a web interaction
         
         try:
             # Wait for rate limit if needed
-            while not self.request_pool.can_make_request():
-                time.sleep(1)
-            self.request_pool.add_request()
+            while (wait := self.request_pool.acquire()) > 0:
+                time.sleep(wait)
             
             response = self.client.chat.completions.create(
                 model=self.model,
@@ -225,6 +232,9 @@ Based on the task and error message, suggest a new web interaction that might wo
 Respond with a JSON object following the same schema as before."""
 
         try:
+            while (wait := self.request_pool.acquire()) > 0:
+                time.sleep(wait)
+            
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
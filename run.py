@@ -1,8 +1,9 @@
-import json
+import orjson
 import argparse
 from pathlib import Path
 from parallel_runner import run_parallel_benchmark
 from serial_runner import run_serial_benchmark
+from utils import load_tasks_with_ground_truth
 from evaluation.auto_eval import run_evaluation
 from models import GPT4Model, ClaudeModel, GeminiModel
 import os
@@ -48,8 +49,12 @@ def main():
     parser.add_argument('--evaluate-mode', type=str, choices=['serial', 'parallel'], default='parallel',
                        help='Run evaluations serially or in parallel')
     parser.add_argument('--model', choices=['gpt4', 'claude', 'gemini'], default='gpt4', help='Model to use for the benchmark')
+    parser.add_argument('--batch', action='store_true',
+                       help='Parse all tasks up front through the Message Batches API (claude with --mode serial only)')
     
     args = parser.parse_args()
+    if args.batch and (args.model != 'claude' or args.mode != 'serial'):
+        parser.error("--batch requires --model claude and --mode serial")
     
     # Create output directory if it doesn't exist
     output_dir = Path(args.output)
@@ -58,6 +63,11 @@ def main():
     # Initialize the selected model
     model = get_model(args.model)
     
+    # Batch replies are only reused when the task is parsed without page HTML,
+    # which is what the serial runner does
+    if args.batch:
+        model.submit_batch(load_tasks_with_ground_truth(args.tasks))
+    
     # Run benchmark based on mode
     if args.mode == 'parallel':
         results = run_parallel_benchmark(
@@ -77,8 +87,7 @@ def main():
     
     # Save results
     results_file = output_dir / 'results.json'
-    with open(results_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    results_file.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
     
     # Run evaluation if requested
     if args.evaluate:
@@ -92,9 +101,10 @@ def main():
         )
         
         # Update results with evaluations
+        eval_by_id = {e['task_id']: e for e in eval_results['evaluations']}
         for result in results:
             task_id = result['task_id']
-            eval_result = next((e for e in eval_results['evaluations'] if e['task_id'] == task_id), None)
+            eval_result = eval_by_id.get(task_id)
             if eval_result:
                 # Get evaluation scores and explanations, with defaults if missing
                 visual_score = eval_result.get('visual_score', 0.0)
@@ -122,8 +132,7 @@ def main():
                     result['error'] = "Failed evaluation checks"
         
         # Save updated results
-        with open(results_file, 'w') as f:
-            json.dump(results, f, indent=2)
+        results_file.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
 
 if __name__ == '__main__':
     main()
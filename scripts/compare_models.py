@@ -1,7 +1,7 @@
 """Script to compare different model performances on the DOM benchmark."""
 
 import os
-import json
+import orjson
 import time
 import argparse
 from typing import List, Dict
@@ -13,8 +13,8 @@ from utils import TaskExecutor
 
 def load_tasks(task_file: str) -> List[Dict]:
     """Load benchmark tasks from a JSON file."""
-    with open(task_file, 'r') as f:
-        return [json.loads(line) for line in f]
+    with open(task_file, 'rb') as f:
+        return [orjson.loads(line) for line in f if line.strip()]
 
 def run_model_on_task(model, task, executor):
     """Run a single task with timing and error handling."""
@@ -107,8 +107,8 @@ def main():
     
     # Save results
     os.makedirs(os.path.dirname(args.output), exist_ok=True)
-    with open(args.output, 'w') as f:
-        json.dump(results, f, indent=2)
+    with open(args.output, 'wb') as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
     
     print(f"\nResults saved to {args.output}")
 
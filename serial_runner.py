@@ -76,8 +76,8 @@ class SerialTaskRunner:
         driver.get("about:blank")
         return driver
     
-    def execute_task(self, task: Dict[str, Any], task_num: int, total_tasks: int) -> Dict[str, Any]:
-        """Execute a single benchmark task"""
+    def execute_task(self, task: Dict[str, Any], task_num: int, total_tasks: int, web_interaction) -> Dict[str, Any]:
+        """Execute a single benchmark task with its already-parsed interaction"""
         task_id = task.get('id', 'unknown')
         logging.info(f"\n{'='*50}")
         logging.info(f"Starting task {task_num}/{total_tasks}: {task_id}")
@@ -108,7 +108,8 @@ class SerialTaskRunner:
             time.sleep(self.wait_time)  # Wait for page load
             
             # Execute interaction
-            web_interaction = self.model.parse_task(task)
+            if web_interaction is None:
+                raise ValueError("Model unable to parse task")
             interaction = {
                 'action': web_interaction.action,
                 'target_element': {
@@ -169,8 +170,12 @@ class SerialTaskRunner:
         try:
             self.driver = self.setup_driver()
             
-            for i, task in enumerate(tasks, 1):
-                result = self.execute_task(task, i, len(tasks))
+            # Serial runs send the model no page HTML, so every task can be
+            # parsed up front while the browser work stays one at a time
+            interactions = self.model.parse_tasks(tasks)
+            
+            for i, (task, web_interaction) in enumerate(zip(tasks, interactions), 1):
+                result = self.execute_task(task, i, len(tasks), web_interaction)
                 results.append(result)
                 
         finally:
@@ -0,0 +1,61 @@
+import os
+import types
+import asyncio
+import tempfile
+
+# The judge caches are placed at import time; keep them out of the home directory
+os.environ.setdefault("DOME_EVAL_CACHE", tempfile.mkdtemp(prefix="dome_eval_test_"))
+
+import pytest
+from PIL import Image
+
+from evaluation import cache, rate_limit
+
+VERDICT = '{"correctness": true, "reason": "ok"}'
+
+class FakeCompletions:
+    """Stands in for client.chat.completions, recording every request"""
+    def __init__(self, reply, delay):
+        self.reply = reply
+        self.delay = delay
+        self.requests = []
+
+    async def create(self, **request):
+        self.requests.append(request)
+        await asyncio.sleep(self.delay)
+        content = self.reply(request) if callable(self.reply) else self.reply
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+class FakeClient:
+    """Minimal AsyncOpenAI replacement for the judge functions"""
+    def __init__(self, reply=VERDICT, delay=0):
+        self.chat = types.SimpleNamespace(completions=FakeCompletions(reply, delay))
+
+    def with_options(self, **options):
+        return self
+
+    @property
+    def requests(self):
+        return self.chat.completions.requests
+
+@pytest.fixture(autouse=True)
+def fresh_cache(tmp_path, monkeypatch):
+    """Give every test an empty reply cache and a fresh rate limiter"""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    cache._memory.clear()
+    rate_limit.reset()
+    yield
+    cache._memory.clear()
+
+@pytest.fixture
+def make_image(tmp_path):
+    """Write a PNG drawn by `draw(pixels, width, height)` and return its path"""
+    def make(name, color=(255, 255, 255), size=(64, 64), draw=None):
+        img = Image.new("RGB", size, color)
+        if draw:
+            draw(img.load(), *size)
+        path = tmp_path / name
+        img.save(path)
+        return str(path)
+    return make
@@ -0,0 +1,46 @@
+import asyncio
+
+from evaluation import cache
+from conftest import FakeClient, VERDICT
+
+def _request(text="Is this correct?"):
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": text}]}
+
+def test_concurrent_identical_requests_share_one_call():
+    client = FakeClient(delay=0.05)
+
+    async def main():
+        return await asyncio.gather(*(cache.cached_completion_text(client, **_request()) for _ in range(3)))
+
+    assert asyncio.run(main()) == [VERDICT] * 3
+    assert len(client.requests) == 1
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    client = FakeClient(delay=0.05)
+
+    async def main():
+        first = asyncio.ensure_future(cache.cached_completion_text(client, **_request()))
+        second = asyncio.ensure_future(cache.cached_completion_text(client, **_request()))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == VERDICT
+    assert len(client.requests) == 1
+    assert not cache._pending
+
+def test_memory_cache_drops_the_least_recently_used(monkeypatch):
+    monkeypatch.setattr(cache, "MEMORY_CACHE_SIZE", 2)
+    client = FakeClient()
+    keys = [cache.request_key(**_request(text)) for text in "abc"]
+
+    async def main():
+        for text in "abac":
+            await cache.cached_completion_text(client, **_request(text))
+        evicted = list(cache._memory)
+        await cache.cached_completion_text(client, **_request("b"))
+        return evicted
+
+    assert asyncio.run(main()) == [keys[0], keys[2]]
+    # The evicted reply is read back from disk rather than asked for again
+    assert len(client.requests) == 3
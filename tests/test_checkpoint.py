@@ -0,0 +1,100 @@
+import asyncio
+
+import orjson
+import pytest
+
+from evaluation import auto_eval
+
+RESULT = {"success": True, "after_screenshot": "agent.png", "html_element": "<a>go</a>"}
+
+@pytest.fixture
+def judged(monkeypatch):
+    """Replace the judges; returns the ids evaluated, and the ids to fail as an error"""
+    evaluated, failing = [], set()
+
+    async def evaluate_task(task, result, client, judge_model=None, fused=False):
+        evaluated.append(task['id'])
+        if task['id'] in failing:
+            return auto_eval._failed_evaluation(task['id'], RuntimeError("boom"))
+        return auto_eval._build_evaluation(task['id'], result, (True, "ok"), (True, "ok"))
+
+    async def prewarm(*args):
+        pass
+
+    monkeypatch.setattr(auto_eval, "evaluate_task", evaluate_task)
+    monkeypatch.setattr(auto_eval, "_prewarm", prewarm)
+    return evaluated, failing
+
+def _evaluate(ids, checkpoint_file, resume=False):
+    tasks = [{"id": task_id} for task_id in ids]
+    results_by_id = {task_id: RESULT for task_id in ids}
+    evaluations, _ = asyncio.run(auto_eval._evaluate_tasks(
+        tasks, results_by_id, "key", 2, checkpoint_file=checkpoint_file, resume=resume
+    ))
+    return {e["task_id"]: e for e in evaluations}
+
+def _line(task_id, reasoning="ok"):
+    evaluation = {"task_id": task_id, "visual_reasoning": reasoning, "html_reasoning": reasoning}
+    return orjson.dumps(evaluation) + b"\n"
+
+def test_rerun_without_resume_starts_a_new_checkpoint(tmp_path, judged):
+    checkpoint = tmp_path / "evaluation.jsonl"
+    checkpoint.write_bytes(_line("stale"))
+
+    evaluations = _evaluate(["a"], checkpoint)
+
+    assert list(evaluations) == ["a"]
+    assert list(auto_eval.read_checkpoint(checkpoint)) == ["a"]
+
+def test_resume_retries_errors_and_the_task_cut_off_mid_line(tmp_path, judged):
+    evaluated, _ = judged
+    checkpoint = tmp_path / "evaluation.jsonl"
+    checkpoint.write_bytes(_line("a") + _line("b", auto_eval.FAILED_REASONING) + b'{"task_id": "c", "vis')
+
+    evaluations = _evaluate(["a", "b", "c"], checkpoint, resume=True)
+
+    assert sorted(evaluated) == ["b", "c"]
+    assert sorted(evaluations) == ["a", "b", "c"]
+    assert all(auto_eval._is_finished(e) for e in evaluations.values())
+
+def test_partial_last_line_is_skipped(tmp_path):
+    checkpoint = tmp_path / "evaluation.jsonl"
+    checkpoint.write_bytes(_line("a") + b'{"task_id": "b", "vis')
+
+    assert list(auto_eval.read_checkpoint(checkpoint)) == ["a"]
+
+def _run_evaluation(tmp_path, ids):
+    tasks_file = tmp_path / "tasks.jsonl"
+    tasks_file.write_bytes(b"".join(orjson.dumps({"id": task_id}) + b"\n" for task_id in ids))
+    results_file = tmp_path / "results.json"
+    results_file.write_bytes(orjson.dumps([dict(RESULT, task_id=task_id) for task_id in ids]))
+    output_file = tmp_path / "evaluation.json"
+    auto_eval.run_evaluation(tasks_file, results_file, output_file, "key", max_workers=2)
+    return output_file
+
+def test_checkpoint_is_removed_once_every_task_has_a_verdict(tmp_path, judged):
+    output_file = _run_evaluation(tmp_path, ["a", "b"])
+
+    assert len(orjson.loads(output_file.read_bytes())["evaluations"]) == 2
+    assert not output_file.with_suffix(".jsonl").exists()
+
+def test_checkpoint_is_kept_while_tasks_have_errors(tmp_path, judged):
+    _, failing = judged
+    failing.add("b")
+
+    output_file = _run_evaluation(tmp_path, ["a", "b"])
+
+    assert sorted(auto_eval.read_checkpoint(output_file.with_suffix(".jsonl"))) == ["a", "b"]
+
+def test_checkpoint_is_removed_when_the_caller_saves_the_output(tmp_path, judged):
+    # evaluate.py writes the output itself and only passes the checkpoint
+    tasks_file = tmp_path / "tasks.jsonl"
+    tasks_file.write_bytes(orjson.dumps({"id": "a"}) + b"\n")
+    results_file = tmp_path / "results.json"
+    results_file.write_bytes(orjson.dumps([dict(RESULT, task_id="a")]))
+    checkpoint = tmp_path / "results_with_eval.jsonl"
+
+    evaluation = auto_eval.run_evaluation(tasks_file, results_file, None, "key", checkpoint_file=checkpoint)
+
+    assert [e["task_id"] for e in evaluation["evaluations"]] == ["a"]
+    assert not checkpoint.exists()
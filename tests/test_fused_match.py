@@ -0,0 +1,35 @@
+import asyncio
+
+from evaluation.fused_match import judge_task
+from conftest import FakeClient
+
+def test_unreadable_ground_truth_fails_only_the_visual_check(tmp_path, make_image):
+    agent = make_image("agent.png")
+    client = FakeClient()
+
+    visual, html = asyncio.run(judge_task(
+        "Click the link", str(tmp_path / "missing.png"), agent, "<a>went</a>", "<a>go</a>", openai_client=client
+    ))
+
+    assert visual[0] is False and visual[1].startswith("Error comparing images")
+    assert html == (True, "ok")
+    # Only the HTML judge was asked, on its own
+    assert [r["response_format"]["json_schema"]["name"] for r in client.requests] == ["verdict"]
+
+def test_unsettled_pair_is_judged_in_one_request(make_image):
+    def stripes(pixels, width, height):
+        for x in range(0, width, 8):
+            for y in range(height):
+                pixels[x, y] = (0, 0, 0)
+    ground_truth = make_image("gt.png")
+    agent = make_image("agent.png", draw=stripes)
+    client = FakeClient(
+        '{"visual_correctness": true, "visual_reason": "v", "html_correctness": false, "html_reason": "h"}'
+    )
+
+    visual, html = asyncio.run(judge_task(
+        "Click the link", ground_truth, agent, "<a>went</a>", "<a>go</a>", openai_client=client
+    ))
+
+    assert visual == (True, "v") and html == (False, "h")
+    assert len(client.requests) == 1
@@ -0,0 +1,17 @@
+from evaluation.fuzzy_match import prejudge_html
+
+def test_identical_canonical_html_passes():
+    verdict = prejudge_html('<a  class="x" href="/go">Go</a>', '<a href="/go" class="x">Go</a>')
+
+    assert verdict is not None and verdict[0] is True
+
+def test_root_tag_mismatch_fails():
+    verdict = prejudge_html('<button>Go</button>', '<a href="/go">Go</a>')
+
+    assert verdict == (False, "Tag mismatch: expected <a>, got <button>")
+
+def test_empty_actual_html_goes_to_the_judge():
+    assert prejudge_html('', '<a href="/go">Go</a>') is None
+
+def test_same_tag_with_different_content_goes_to_the_judge():
+    assert prejudge_html('<a href="/go">Go now</a>', '<a href="/go">Go</a>') is None
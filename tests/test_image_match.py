@@ -0,0 +1,31 @@
+from evaluation.image_match import prejudge_images
+
+def _squares(pixels, width, height):
+    for x in range(width):
+        for y in range(height):
+            if (x // 16 + y // 16) % 2 == 0:
+                pixels[x, y] = (0, 0, 0)
+
+def _diagonals(pixels, width, height):
+    for x in range(width):
+        for y in range(height):
+            if (x + y) // 8 % 2 == 0:
+                pixels[x, y] = (0, 0, 0)
+
+def _button(pixels, width, height):
+    for x in range(8, 24):
+        for y in range(8, 16):
+            pixels[x, y] = (0, 0, 255)
+
+def test_identical_pixels_pass(make_image):
+    verdict = prejudge_images(make_image("gt.png", draw=_squares), make_image("agent.png", draw=_squares))
+
+    assert verdict is not None and verdict[0] is True
+
+def test_far_hash_and_low_ssim_fail(make_image):
+    verdict = prejudge_images(make_image("gt.png", draw=_squares), make_image("agent.png", draw=_diagonals))
+
+    assert verdict is not None and verdict[0] is False
+
+def test_small_difference_goes_to_the_judge(make_image):
+    assert prejudge_images(make_image("gt.png"), make_image("agent.png", draw=_button)) is None
@@ -0,0 +1,24 @@
+import asyncio
+
+from evaluation import rate_limit
+from conftest import FakeClient
+
+def test_reset_starts_each_run_with_a_closed_breaker():
+    rate_limit.reset()
+    for _ in range(rate_limit.circuit_breaker.threshold):
+        rate_limit.circuit_breaker.record_failure()
+    assert rate_limit.circuit_breaker.open
+
+    rate_limit.reset(max_requests_per_minute=60, burst=2)
+
+    assert not rate_limit.circuit_breaker.open
+    assert rate_limit.rate_limiter.rate == 1 and rate_limit.rate_limiter.capacity == 2
+
+def test_calls_go_through_the_current_limiter():
+    rate_limit.reset(burst=1)
+    client = FakeClient()
+
+    asyncio.run(rate_limit.create_chat_completion(client, model="m", messages=[]))
+
+    assert rate_limit.rate_limiter.tokens < 1
+    assert len(client.requests) == 1
@@ -1,6 +1,7 @@
 import os
 import json
 import time
+import orjson
 import logging
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Union, Tuple
@@ -147,8 +148,9 @@ def save_accessibility_tree(tree: Dict[str, Any], filepath: str) -> bool:
     """Save accessibility tree to file"""
     try:
         Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-        with open(filepath, 'w') as f:
-            json.dump(tree, f, indent=2)
+        # orjson serializes large trees far faster than json.dump with indent
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(tree, option=orjson.OPT_INDENT_2))
         logging.info(f"Accessibility tree saved to {filepath}")
         return True
     except Exception as e:
@@ -176,5 +178,5 @@ def load_tasks(tasks_file: str) -> List[Dict[str, Any]]:
 
 def save_results(results: List[Dict[str, Any]], output_file: str) -> None:
     """Save benchmark results to JSON file"""
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
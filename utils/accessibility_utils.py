@@ -1,3 +1,5 @@
+import re
+from collections import Counter
 from typing import Dict, Any, List, Optional, TypedDict
 from selenium import webdriver
 
@@ -120,10 +122,22 @@ def get_element_html_context(driver: webdriver.Chrome, element) -> Dict[str, Any
         ][:3]  # Get up to 3 siblings for context
     }
 
+# Splits markup into whole tags and the text runs between them
+HTML_TOKEN_PATTERN = re.compile(r'<[^>]*>|[^<\s]+')
+
+def html_token_counts(html: str) -> Counter:
+    """Count the tag and text tokens in an HTML fragment."""
+    return Counter(HTML_TOKEN_PATTERN.findall(html or ""))
+
+def multiset_jaccard(a: Counter, b: Counter) -> float:
+    """Jaccard similarity of two token multisets; identical inputs score 1.0."""
+    union = sum((a | b).values())
+    if not union:
+        return 1.0
+    return sum((a & b).values()) / union
+
 def compare_html_elements(suggested: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, float]:
     """Compare two HTML elements and return similarity scores."""
-    from difflib import SequenceMatcher
-    
     # Structure score (40%)
     structure_score = (
         (suggested["tag_name"] == target["tag_name"]) * 0.5 +
@@ -141,11 +155,12 @@ def compare_html_elements(suggested: Dict[str, Any], target: Dict[str, Any]) ->
     attrs_score = matching_attrs / max(len(target["attributes"]), 1)
     
     # Content similarity score (30%)
-    content_score = SequenceMatcher(
-        None,
-        suggested["inner_html"],
-        target["inner_html"]
-    ).ratio()
+    # Token multiset overlap is linear in the fragment size, unlike a
+    # character-level SequenceMatcher diff
+    content_score = multiset_jaccard(
+        html_token_counts(suggested["inner_html"]),
+        html_token_counts(target["inner_html"])
+    )
     
     return {
         "structure_score": structure_score,